@@ -0,0 +1,40 @@
+"""
+Ahead-of-time build of the backtest kernels.
+
+Compiles _bt_core.run_bt and _unified_core._backtest_loop into the extension module
+backtesting/_bt_core_aot, so a fresh process can run backtests without paying the
+Numba JIT warm-up. When the extension (or one of its exports) is missing,
+simple_time_strategy_bt and unified_backtest_engine fall back to the JIT kernels.
+
+Usage:
+    python backtesting/_aot_build.py
+"""
+import os
+import sys
+
+from numba.pycc import CC
+
+BACKTESTING_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.append(os.path.dirname(BACKTESTING_DIR))
+
+from backtesting import _bt_core, _unified_core  # noqa: E402
+
+_RUN_BT_ARGS = '{ticks}[:], {ticks}[:], f8[:], i8[:], i1[:], f8, f8, f8, f8, f8, f8, i8, b1, b1'
+_RUN_BT_RESULT = 'Tuple((f8[:,:], f8[:]))'
+_BACKTEST_LOOP_SIG = 'i8(i8, f8[:], f8[:], f8[:], i1[:], i8[:], f8[:], f8[:,:], f8[:], f8, b1, b1)'
+
+cc = CC('_bt_core_aot')
+cc.output_dir = BACKTESTING_DIR
+
+# int32 ticks cover regular FX/metal quotes; the int64 variant handles to_ticks' wide fallback
+cc.export('run_bt', f"{_RUN_BT_RESULT}({_RUN_BT_ARGS.format(ticks='i4')})")(_bt_core.run_bt.py_func)
+cc.export('run_bt_i8', f"{_RUN_BT_RESULT}({_RUN_BT_ARGS.format(ticks='i8')})")(_bt_core.run_bt.py_func)
+# Resumable loop of UnifiedBacktestingEngine
+cc.export('backtest_loop', _BACKTEST_LOOP_SIG)(_unified_core._backtest_loop.py_func)
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print(f"Built {cc.name} in {BACKTESTING_DIR}")
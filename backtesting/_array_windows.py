@@ -0,0 +1,48 @@
+"""
+Zero-copy NumPy lookback windows for strategies evaluated bar by bar.
+
+A strategy that sets `window_format = 'numpy'` and declares either `needs_window`
+(bars) or `needs_lookback_seconds` (time span) receives, for each bar, an
+ArrayWindow of NumPy views ending at that bar instead of the DataFrame. Views are
+slices of the cached column arrays, so no DataFrame is built per bar; time-based
+windows are located with np.searchsorted on the ns timestamps (O(log n) per bar).
+"""
+from collections import namedtuple
+from typing import Iterator, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtesting._data_cache import extract_ohlc
+
+
+# Views over the bars of the window; the current bar is the last element
+ArrayWindow = namedtuple('ArrayWindow', 'open high low close volume index_ns')
+
+
+def window_starts(index_ns: np.ndarray, lookback_ns: int) -> np.ndarray:
+    """First bar of each time window: start[i] = first j with index_ns[j] >= index_ns[i] - lookback_ns."""
+    return np.searchsorted(index_ns, index_ns - lookback_ns, side='left')
+
+
+def iter_array_windows(data: pd.DataFrame, window: Optional[int] = None,
+                       lookback_seconds: Optional[float] = None) -> Iterator[ArrayWindow]:
+    """
+    Yields an ArrayWindow per bar holding the last `window` bars, or the bars within
+    `lookback_seconds` of the current one (requires a sorted DatetimeIndex).
+    """
+    ohlc = extract_ohlc(data)
+    n = len(data)
+    if lookback_seconds is not None:
+        if not ohlc.time_indexed:
+            raise ValueError("needs_lookback_seconds requires a DatetimeIndex")
+        starts = window_starts(ohlc.index_ns, int(lookback_seconds * 1_000_000_000))
+    else:
+        starts = np.maximum(np.arange(n) - int(window) + 1, 0)
+
+    for i, start in enumerate(starts.tolist()):
+        stop = i + 1
+        yield ArrayWindow(
+            ohlc.open[start:stop], ohlc.high[start:stop], ohlc.low[start:stop],
+            ohlc.close[start:stop], ohlc.volume[start:stop], ohlc.index_ns[start:stop]
+        )
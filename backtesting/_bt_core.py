@@ -0,0 +1,319 @@
+"""
+Compiled core of the SimpleTimeStrategy backtest.
+
+The bar-by-bar state machine runs on plain NumPy arrays so it can be
+JIT-compiled with Numba. When Numba is not installed the same function
+runs as regular Python.
+"""
+import numpy as np
+
+from utils._njit import njit, prange
+
+
+# Signal codes (strategy output mapped to int8 before entering the kernel)
+SIGNAL_HOLD = 0
+SIGNAL_BUY = 1
+SIGNAL_SELL = -1
+SIGNAL_CODES = {'buy': SIGNAL_BUY, 'sell': SIGNAL_SELL, 'hold': SIGNAL_HOLD}
+
+# Position / trade type codes
+TYPE_LONG = 1
+TYPE_SHORT = -1
+
+# Exit reason codes
+EXIT_SL = 1
+EXIT_TP = 2
+EXIT_TIME = 3
+EXIT_SIGNAL = 4
+EXIT_STRATEGY_CLOSE = 5
+EXIT_END_OF_DATA = 6
+EXIT_REASONS = {
+    EXIT_SL: 'sl', EXIT_TP: 'tp', EXIT_TIME: 'time', EXIT_SIGNAL: 'signal',
+    EXIT_STRATEGY_CLOSE: 'strategy_close', EXIT_END_OF_DATA: 'end_of_data'
+}
+
+# Column layout of the trades array returned by run_bt
+TRADE_COLUMNS = (
+    'entry_idx', 'exit_idx', 'entry_price', 'exit_price',
+    'pnl', 'type_code', 'exit_reason_code', 'position_size'
+)
+N_TRADE_COLUMNS = len(TRADE_COLUMNS)
+
+# Structured view of the same columns, used outside the kernel
+TRADE_DTYPE = np.dtype([
+    ('entry_idx', 'i8'), ('exit_idx', 'i8'), ('entry_price', 'f8'), ('exit_price', 'f8'),
+    ('pnl', 'f8'), ('type_code', 'i1'), ('exit_reason_code', 'i1'), ('position_size', 'f8')
+])
+
+# Column layout of the metrics array returned by run_sweep
+SWEEP_COLUMNS = (
+    'sl_pips', 'tp_pips', 'hold_seconds', 'total_pnl', 'total_trades',
+    'win_rate', 'profit_factor', 'max_drawdown', 'final_capital'
+)
+
+# Bars per tile in the main loop (~4K bars keeps the price slices cache-resident)
+TILE_BARS = 4096
+
+
+def to_ticks(prices: np.ndarray, tick_size: float) -> np.ndarray:
+    """Quantizes prices to integer ticks (int32 unless the price range needs int64)."""
+    ticks = np.rint(prices / tick_size)
+    if np.abs(ticks).max() < np.iinfo(np.int32).max:
+        return ticks.astype(np.int32)
+    return ticks.astype(np.int64)
+
+
+def trades_to_records(trades: np.ndarray) -> np.ndarray:
+    """Converts the (n_trades, N_TRADE_COLUMNS) float64 array from run_bt into a TRADE_DTYPE record array."""
+    records = np.empty(trades.shape[0], dtype=TRADE_DTYPE)
+    for col, name in enumerate(TRADE_COLUMNS):
+        records[name] = trades[:, col]
+    return records
+
+
+def resolve_signals(strategy, data) -> np.ndarray:
+    """
+    Returns the strategy signal for every bar as a contiguous int8 array (SIGNAL_*).
+
+    Uses strategy.generate_signals_vectorized(data) when the strategy provides it;
+    otherwise falls back to calling generate_signal bar by bar. Strategies that
+    declare `needs_window` (bars of lookback) are called as
+    generate_signal(window, len(window) - 1) on a zero-copy window of the data
+    (see _polars_adapter) instead of receiving the whole frame. With
+    `window_format = 'numpy'` the window is an ArrayWindow of NumPy views instead,
+    and `needs_lookback_seconds` may replace the bar count (see _array_windows).
+    """
+    vectorized = getattr(strategy, 'generate_signals_vectorized', None)
+    if vectorized is not None:
+        return np.ascontiguousarray(vectorized(data), dtype=np.int8)
+
+    n = len(data)
+    window = getattr(strategy, 'needs_window', None)
+    lookback_seconds = getattr(strategy, 'needs_lookback_seconds', None)
+    if getattr(strategy, 'window_format', None) == 'numpy' and (window or lookback_seconds):
+        from backtesting._array_windows import iter_array_windows
+        return np.fromiter(
+            (SIGNAL_CODES.get(strategy.generate_signal(view, len(view.close) - 1), SIGNAL_HOLD)
+             for view in iter_array_windows(data, window, lookback_seconds)),
+            dtype=np.int8,
+            count=n
+        )
+    if window:
+        from backtesting._polars_adapter import iter_windows
+        return np.fromiter(
+            (SIGNAL_CODES.get(strategy.generate_signal(view, len(view) - 1), SIGNAL_HOLD)
+             for view in iter_windows(data, int(window))),
+            dtype=np.int8,
+            count=n
+        )
+
+    return np.fromiter(
+        (SIGNAL_CODES.get(strategy.generate_signal(data, i), SIGNAL_HOLD) for i in range(n)),
+        dtype=np.int8,
+        count=n
+    )
+
+
+@njit(cache=True)
+def _record_trade(trades, k, entry_idx, exit_idx, entry_price, exit_price, pnl, type_code, exit_reason, position_size):
+    trades[k, 0] = entry_idx
+    trades[k, 1] = exit_idx
+    trades[k, 2] = entry_price
+    trades[k, 3] = exit_price
+    trades[k, 4] = pnl
+    trades[k, 5] = type_code
+    trades[k, 6] = exit_reason
+    trades[k, 7] = position_size
+
+
+@njit(cache=True)
+def run_bt(high_ticks, low_ticks, close, ts_ns, signals, initial_capital, risk_per_trade, commission,
+           sl_pips, tp_pips, pip_size, hold_ns, sl_tp_fixed, time_exit):
+    """
+    Runs the SimpleTimeStrategy state machine over pre-extracted arrays.
+
+    Args:
+        high_ticks, low_ticks: High/Low quantized to ticks of pip_size / 10
+        close: Close prices (float64)
+        ts_ns: Bar timestamps in epoch nanoseconds (int64)
+        signals: Strategy signals per bar (int8, see SIGNAL_*)
+        hold_ns: Maximum holding time in nanoseconds
+        sl_tp_fixed: True when sl_tp_mode == 'fixed_pips'
+        time_exit: True when bars carry real timestamps (enables the hold-time exit)
+
+    Returns:
+        (trades, equity_curve): trades is a (n_trades, N_TRADE_COLUMNS) float64 array laid out as
+        TRADE_COLUMNS; equity_curve has one value per bar plus the initial capital.
+    """
+    n = close.shape[0]
+    # At most one trade closes per bar; written by row index so the loop stays in nopython mode
+    trades = np.empty((n, N_TRADE_COLUMNS), dtype=np.float64)
+    equity_curve = np.empty(n + 1, dtype=np.float64)
+    equity_curve[0] = initial_capital
+    n_trades = 0
+
+    tick_size = pip_size / 10
+    sl_ticks = round(sl_pips * 10)
+    tp_ticks = round(tp_pips * 10)
+
+    # Entry notional is position_size * entry_price == capital * risk_per_trade,
+    # so the entry commission is a fixed fraction of capital
+    entry_cost_rate = risk_per_trade * commission
+
+    capital = initial_capital
+    position = 0  # 0: no position, 1: long, -1: short
+    entry_price = 0.0
+    position_size = 0.0
+    # Invariant: position != 0 implies entry_idx >= 0 and entry_time_ns is set, so the
+    # exit checks need no extra "is an entry recorded" flags (-1 is the flat sentinel)
+    entry_idx = -1
+    entry_time_ns = np.int64(-1)
+    sl_price = 0.0
+    tp_price = 0.0
+    sl_tick = 0
+    tp_tick = 0
+
+    for tile_start in range(0, n, TILE_BARS):
+        tile_end = min(tile_start + TILE_BARS, n)
+        high_t = high_ticks[tile_start:tile_end]
+        low_t = low_ticks[tile_start:tile_end]
+        close_t = close[tile_start:tile_end]
+
+        for i in range(tile_start, tile_end):
+            j = i - tile_start
+            signal = signals[i]
+
+            if position != 0:
+                # Exit precedence: SL, then TP (intrabar), then hold time; one close path for all.
+                # SL/TP is sign-parameterized so long and short share one check:
+                # for side = +1 the adverse extreme is Low, for side = -1 it is High
+                side = position
+                exit_reason = 0
+                exit_price = 0.0
+                if sl_tp_fixed:
+                    adverse_tick = low_t[j] if side == 1 else high_t[j]
+                    favorable_tick = high_t[j] if side == 1 else low_t[j]
+                    if side * (adverse_tick - sl_tick) <= 0:
+                        exit_reason = EXIT_SL
+                        exit_price = sl_price
+                    elif side * (favorable_tick - tp_tick) >= 0:
+                        exit_reason = EXIT_TP
+                        exit_price = tp_price
+                if exit_reason == 0:
+                    time_diff_ns = ts_ns[i] - entry_time_ns if time_exit else 0
+                    if time_diff_ns >= hold_ns:
+                        exit_reason = EXIT_TIME
+                        exit_price = close_t[j]
+
+                if exit_reason != 0:
+                    pnl = side * (exit_price - entry_price) * position_size
+                    capital += pnl - (position_size * exit_price * commission)
+                    _record_trade(trades, n_trades, entry_idx, i, entry_price, exit_price,
+                                  pnl, side, exit_reason, position_size)
+                    n_trades += 1
+                    position = 0
+                    position_size = 0.0
+                    entry_time_ns = -1
+
+            # Signals: open on a buy/sell while flat, close on the opposite signal.
+            # Long and short share one path through side = +1 / -1.
+            if signal != SIGNAL_HOLD and position == 0:
+                side = np.int64(signal)
+                entry_price = close_t[j]
+                position_size = (capital * risk_per_trade) / entry_price
+                position = side
+                entry_idx = i
+                entry_time_ns = ts_ns[i]
+                if sl_tp_fixed:
+                    sl_price = entry_price - side * (sl_pips * pip_size)
+                    tp_price = entry_price + side * (tp_pips * pip_size)
+                    entry_tick = round(entry_price / tick_size)
+                    sl_tick = entry_tick - side * sl_ticks
+                    tp_tick = entry_tick + side * tp_ticks
+                capital -= capital * entry_cost_rate
+
+            elif signal == -position and position != 0:
+                exit_price = close_t[j]
+                pnl = position * (exit_price - entry_price) * position_size
+                capital += pnl - (position_size * exit_price * commission)
+                _record_trade(trades, n_trades, entry_idx, i, entry_price, exit_price,
+                              pnl, position, EXIT_SIGNAL, position_size)
+                n_trades += 1
+                position = 0
+                position_size = 0.0
+                entry_time_ns = -1
+
+            equity_curve[i + 1] = capital
+
+    return trades[:n_trades], equity_curve
+
+
+@njit(cache=True)
+def _summarize(trades, equity_curve, initial_capital, out):
+    """Writes total_pnl .. final_capital of one run into out (SWEEP_COLUMNS[3:])."""
+    n_trades = trades.shape[0]
+    n_wins = 0
+    win_sum = 0.0
+    loss_sum = 0.0
+    n_losses = 0
+    for k in range(n_trades):
+        pnl = trades[k, 4]
+        if pnl > 0:
+            n_wins += 1
+            win_sum += pnl
+        elif pnl < 0:
+            n_losses += 1
+            loss_sum += pnl
+
+    peak = equity_curve[0]
+    max_dd = 0.0
+    for k in range(equity_curve.shape[0]):
+        value = equity_curve[k]
+        if value > peak:
+            peak = value
+        dd = (peak - value) / peak
+        if dd > max_dd:
+            max_dd = dd
+
+    final_capital = equity_curve[equity_curve.shape[0] - 1]
+    out[0] = final_capital - initial_capital
+    out[1] = n_trades
+    out[2] = n_wins / n_trades if n_trades > 0 else 0.0
+    out[3] = win_sum / abs(loss_sum) if n_losses > 0 else np.inf
+    out[4] = max_dd
+    out[5] = final_capital
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def run_sweep(high_ticks, low_ticks, close, ts_ns, signals, initial_capital, risk_per_trade, commission,
+              sl_grid, tp_grid, hold_grid, pip_size, sl_tp_fixed, time_exit):
+    """
+    Runs run_bt for every (sl_pips, tp_pips, hold_seconds) combination in parallel.
+
+    The price, timestamp and signal arrays are read-only and shared by all runs.
+    hold_grid is given in seconds.
+
+    Returns:
+        (n_combos, len(SWEEP_COLUMNS)) float64 array, combinations in C order
+        (sl varies slowest, hold fastest).
+    """
+    n_sl = sl_grid.shape[0]
+    n_tp = tp_grid.shape[0]
+    n_hold = hold_grid.shape[0]
+    n_combos = n_sl * n_tp * n_hold
+    results = np.empty((n_combos, len(SWEEP_COLUMNS)), dtype=np.float64)
+
+    for k in prange(n_combos):
+        sl_pips = sl_grid[k // (n_tp * n_hold)]
+        tp_pips = tp_grid[(k // n_hold) % n_tp]
+        hold_seconds = hold_grid[k % n_hold]
+        trades, equity_curve = run_bt(
+            high_ticks, low_ticks, close, ts_ns, signals, initial_capital, risk_per_trade, commission,
+            sl_pips, tp_pips, pip_size, np.int64(hold_seconds * 1_000_000_000), sl_tp_fixed, time_exit
+        )
+        results[k, 0] = sl_pips
+        results[k, 1] = tp_pips
+        results[k, 2] = hold_seconds
+        _summarize(trades, equity_curve, initial_capital, results[k, 3:])
+
+    return results
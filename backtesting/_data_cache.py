@@ -0,0 +1,105 @@
+"""
+Cache of the arrays (and other derived forms) extracted from an OHLCV DataFrame
+for the backtest kernels.
+
+Sweeps and repeated backtests usually pass the same DataFrame many times; each
+conversion is done once per frame and reused. Entries are keyed by id(data),
+invalidated when an OHLCV column is replaced and dropped automatically when the
+DataFrame is garbage collected. In-place writes into the column buffers are not
+detected: call clear_cache() after them.
+"""
+import weakref
+from collections import namedtuple
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+OHLCArrays = namedtuple('OHLCArrays', 'open high low close volume index_ns time_indexed')
+
+# Columns whose buffers identify the data a cached entry was built from
+_SOURCE_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+# id(data) -> (fingerprint, {kind: cached value}, source column arrays)
+_CACHE: Dict[int, Tuple[tuple, Dict[str, Any], tuple]] = {}
+
+
+def _source_arrays(data: pd.DataFrame) -> tuple:
+    return tuple(data[col].to_numpy() for col in _SOURCE_COLUMNS if col in data.columns)
+
+
+def _fingerprint(data: pd.DataFrame, sources: tuple) -> tuple:
+    """
+    Cheap identity check so an id reused by another frame, a resized frame or a
+    replaced column (df['Close'] = ...) misses the cache.
+
+    Columns are identified by their buffer address and dtype; the entry keeps the
+    source arrays alive so those addresses cannot be reused while it exists.
+    Writing into an existing buffer (df.loc[:, 'Close'] = ..., .values[:] = ...)
+    is not detected: call clear_cache() after such in-place edits.
+    """
+    buffers = tuple((a.__array_interface__['data'][0], a.dtype.str) for a in sources)
+    if len(data) == 0:
+        return (data.shape, buffers)
+    return (data.shape, data.index[0], data.index[-1], buffers)
+
+
+def _extract(data: pd.DataFrame) -> OHLCArrays:
+    time_indexed = isinstance(data.index, pd.DatetimeIndex)
+    if time_indexed:
+        index_ns = data.index.as_unit('ns').asi8
+    else:
+        index_ns = np.zeros(len(data), dtype=np.int64)
+    return OHLCArrays(
+        open=np.ascontiguousarray(data['Open'].to_numpy(dtype=np.float64)),
+        high=np.ascontiguousarray(data['High'].to_numpy(dtype=np.float64)),
+        low=np.ascontiguousarray(data['Low'].to_numpy(dtype=np.float64)),
+        close=np.ascontiguousarray(data['Close'].to_numpy(dtype=np.float64)),
+        volume=np.ascontiguousarray(data['Volume'].to_numpy(dtype=np.float64)),
+        index_ns=index_ns,
+        time_indexed=time_indexed
+    )
+
+
+def cached(data: pd.DataFrame, kind: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+    """
+    Returns build(data), computing it only on the first call for this DataFrame and kind.
+
+    Cached values are shared between callers and must be treated as read-only.
+    """
+    key = id(data)
+    sources = _source_arrays(data)
+    fingerprint = _fingerprint(data, sources)
+    entry = _CACHE.get(key)
+    if entry is None or entry[0] != fingerprint:
+        if entry is None:
+            try:
+                weakref.finalize(data, _CACHE.pop, key, None)
+            except TypeError:
+                return build(data)
+        entry = (fingerprint, {}, sources)
+        _CACHE[key] = entry
+
+    values = entry[1]
+    if kind not in values:
+        values[kind] = build(data)
+    return values[kind]
+
+
+def extract_ohlc(data: pd.DataFrame) -> OHLCArrays:
+    """
+    Returns the Open/High/Low/Close/Volume float64 arrays and int64 ns timestamps of data,
+    reusing the arrays from a previous call on the same DataFrame.
+    """
+    return cached(data, 'ohlc', _extract)
+
+
+def clear_cache() -> None:
+    """
+    Drops every cached entry.
+
+    Needed after editing a cached DataFrame's OHLCV values in place (writing into
+    the existing column buffers); replacing a column is detected automatically.
+    """
+    _CACHE.clear()
@@ -0,0 +1,74 @@
+"""
+Optional Polars support for the backtest engines.
+
+Strategies that declare a `needs_window` attribute (number of bars) get, on each bar,
+a zero-copy `pl.DataFrame.slice` of the last `needs_window` bars instead of the whole
+pandas frame. When Polars is not installed the window is a pandas `iloc` slice.
+
+The engines also accept a `pl.DataFrame` as input; ensure_pandas converts it once at
+the boundary (see from_polars).
+"""
+import pandas as pd
+
+from backtesting._data_cache import cached
+
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    pl = None
+    POLARS_AVAILABLE = False
+
+
+def _build_polars(data: pd.DataFrame):
+    # The index (bar time) becomes the first column so windows keep their timestamps
+    return pl.from_pandas(data.reset_index())
+
+
+def to_polars(data: pd.DataFrame):
+    """Returns a Polars copy of data (index as first column), converted once per DataFrame."""
+    if not POLARS_AVAILABLE:
+        raise ImportError("polars is not installed")
+    return cached(data, 'polars', _build_polars)
+
+
+def iter_windows(data: pd.DataFrame, window: int):
+    """
+    Yields, for every bar i, the frame holding the last `window` bars ending at i.
+
+    The current bar is always the last row of the yielded frame.
+    """
+    frame = to_polars(data) if POLARS_AVAILABLE else data
+    for i in range(len(data)):
+        start = max(0, i - window + 1)
+        if POLARS_AVAILABLE:
+            yield frame.slice(start, i + 1 - start)
+        else:
+            yield frame.iloc[start:i + 1]
+
+
+def from_polars(frame) -> pd.DataFrame:
+    """
+    Returns the pandas frame the engines work on for a Polars OHLCV frame.
+
+    Columns are exported with to_numpy() (no copy for null-free numeric columns) and
+    the first Datetime column, if any, becomes the DatetimeIndex.
+    """
+    time_column = next(
+        (name for name, dtype in frame.schema.items() if isinstance(dtype, pl.Datetime)), None
+    )
+    index = None
+    if time_column is not None:
+        index = pd.DatetimeIndex(frame.get_column(time_column).to_numpy(), name=time_column)
+    columns = {
+        name: frame.get_column(name).to_numpy()
+        for name in frame.columns if name != time_column
+    }
+    return pd.DataFrame(columns, index=index, copy=False)
+
+
+def ensure_pandas(data):
+    """Returns data unchanged if it is a pandas frame, or its from_polars conversion for a pl.DataFrame."""
+    if POLARS_AVAILABLE and isinstance(data, pl.DataFrame):
+        return from_polars(data)
+    return data
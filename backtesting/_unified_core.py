@@ -0,0 +1,182 @@
+"""
+Compiled bar loop of UnifiedBacktestingEngine.
+
+Position sizing and SL/TP levels come from the strategy's Python methods, so the
+loop cannot run end to end in nopython mode. Instead the kernel is resumable: it
+runs bars until one needs a new entry, returns that bar index, the engine asks the
+strategy for size and levels, opens the position and resumes at the next bar.
+Python is only re-entered once per trade; every other bar stays compiled.
+"""
+import numpy as np
+
+from utils._njit import njit
+from backtesting._bt_core import (
+    _record_trade, N_TRADE_COLUMNS, SIGNAL_HOLD,
+    EXIT_SL, EXIT_TP, EXIT_STRATEGY_CLOSE, EXIT_END_OF_DATA
+)
+
+# Layout of the mutable state vector shared between the kernel and the engine
+ST_CAPITAL = 0
+ST_POSITION = 1       # 0: no position, 1: long, -1: short
+ST_ENTRY_PRICE = 2
+ST_POSITION_SIZE = 3
+ST_ENTRY_IDX = 4
+ST_SL_PRICE = 5
+ST_TP_PRICE = 6
+ST_HAS_LEVELS = 7     # 1.0 when both SL and TP are set
+ST_N_TRADES = 8
+N_STATE = 9
+
+
+def new_state(initial_capital: float) -> np.ndarray:
+    """Returns a flat state vector (no open position) for _backtest_loop."""
+    state = np.zeros(N_STATE, dtype=np.float64)
+    state[ST_CAPITAL] = initial_capital
+    state[ST_ENTRY_IDX] = -1
+    return state
+
+
+def new_buffers(n_bars: int):
+    """Returns (trades, equity_curve) buffers for a run over n_bars bars."""
+    # At most one exit per bar plus the end-of-data close
+    trades = np.empty((n_bars + 1, N_TRADE_COLUMNS), dtype=np.float64)
+    equity_curve = np.empty(n_bars + 1, dtype=np.float64)
+    return trades, equity_curve
+
+
+def next_signal_index(signals: np.ndarray) -> np.ndarray:
+    """For every bar i, the index of the first bar >= i with a buy/sell signal (n if none)."""
+    n = signals.shape[0]
+    candidates = np.where(signals != SIGNAL_HOLD, np.arange(n, dtype=np.int64), n)
+    return np.ascontiguousarray(np.minimum.accumulate(candidates[::-1])[::-1])
+
+
+@njit(cache=True)
+def _first_level_hit(high, low, start, stop, position, sl_price, tp_price):
+    """
+    Returns (k, exit_reason) for the first bar k in [start, stop) whose range touches
+    SL or TP (SL wins on the same bar), or (stop, 0) when neither level is hit.
+    """
+    if position == 1:
+        for k in range(start, stop):
+            hit_sl = low[k] <= sl_price
+            if hit_sl | (high[k] >= tp_price):
+                return k, EXIT_SL if hit_sl else EXIT_TP
+    else:
+        for k in range(start, stop):
+            hit_sl = high[k] >= sl_price
+            if hit_sl | (low[k] <= tp_price):
+                return k, EXIT_SL if hit_sl else EXIT_TP
+    return stop, 0
+
+
+@njit(cache=True)
+def _backtest_loop(start, high, low, close, signals, next_signal, state, trades, equity_curve,
+                   commission, sl_tp_fixed, close_on_signal):
+    """
+    Runs bars [start, n) until a bar needs a new position or the data ends.
+
+    Event-driven: instead of visiting every bar, it jumps from one event to the next.
+    While flat the next event is the next signal; while in a position it is the first
+    SL/TP touch or, when signals close positions, the next signal bar. Bars in between
+    only get their equity written, one slice per segment.
+
+    Args:
+        high, low, close: Bar prices (float64)
+        signals: Strategy signals per bar (int8, see SIGNAL_*)
+        next_signal: next_signal_index(signals)
+        state: State vector (ST_*), updated in place
+        trades, equity_curve: Output buffers from new_buffers; equity_curve[i + 1]
+            is written for every bar processed
+        sl_tp_fixed: True when sl_tp_mode == 'fixed_pips'
+        close_on_signal: Close the open position on any buy/sell signal
+
+    Returns:
+        Index of the bar where a position must be opened (state is flat and
+        signals[i] != 0; equity_curve[i + 1] is left to the caller), or n once the
+        data is exhausted and any remaining position has been closed at the last bar.
+    """
+    n = close.shape[0]
+    capital = state[ST_CAPITAL]
+    position = int(state[ST_POSITION])
+    entry_price = state[ST_ENTRY_PRICE]
+    position_size = state[ST_POSITION_SIZE]
+    entry_idx = int(state[ST_ENTRY_IDX])
+    sl_price = state[ST_SL_PRICE]
+    tp_price = state[ST_TP_PRICE]
+    has_levels = state[ST_HAS_LEVELS] != 0.0
+    n_trades = int(state[ST_N_TRADES])
+
+    i = start
+    while i < n:
+        if position == 0:
+            # Flat: nothing happens until the next signal, which opens a position
+            k = next_signal[i]
+            equity_curve[i + 1:k + 1] = capital
+            if k == n:
+                break
+            state[ST_CAPITAL] = capital
+            state[ST_POSITION] = 0
+            state[ST_POSITION_SIZE] = 0.0
+            state[ST_HAS_LEVELS] = 0.0
+            state[ST_N_TRADES] = n_trades
+            return k
+
+        # In position: the next exit is the first SL/TP touch (checked first on every bar)
+        # or the next signal bar when signals close positions
+        stop = next_signal[i] if close_on_signal else n
+        k = stop
+        exit_reason = 0
+        if sl_tp_fixed and has_levels:
+            k, exit_reason = _first_level_hit(high, low, i, min(stop + 1, n), position, sl_price, tp_price)
+            if exit_reason == 0:
+                k = stop
+
+        # Bars before the exit keep the position open: equity with unrealized PnL,
+        # settled for the whole segment with one slice store. position is the side
+        # (+1/-1), so one branchless expression covers longs and shorts
+        equity_curve[i + 1:k + 1] = capital + position * (close[i:k] - entry_price) * position_size
+        if k == n:
+            break
+
+        if exit_reason != 0:
+            exit_price = sl_price if exit_reason == EXIT_SL else tp_price
+        else:
+            exit_price = close[k]
+            exit_reason = EXIT_STRATEGY_CLOSE
+        pnl = position * (exit_price - entry_price) * position_size
+        capital += pnl - (position_size * exit_price * commission)
+        _record_trade(trades, n_trades, entry_idx, k, entry_price, exit_price,
+                      pnl, position, exit_reason, position_size)
+        n_trades += 1
+        position = 0
+        position_size = 0.0
+        has_levels = False
+
+        # A signal on the exit bar opens the next position right away
+        if signals[k] != SIGNAL_HOLD:
+            state[ST_CAPITAL] = capital
+            state[ST_POSITION] = 0
+            state[ST_POSITION_SIZE] = 0.0
+            state[ST_HAS_LEVELS] = 0.0
+            state[ST_N_TRADES] = n_trades
+            return k
+        equity_curve[k + 1] = capital
+        i = k + 1
+
+    # Close the final position at the last bar
+    if position != 0:
+        exit_price = close[n - 1]
+        pnl = position * (exit_price - entry_price) * position_size
+        capital += pnl - (position_size * exit_price * commission)
+        _record_trade(trades, n_trades, entry_idx, n - 1, entry_price, exit_price,
+                      pnl, position, EXIT_END_OF_DATA, position_size)
+        n_trades += 1
+        position = 0
+        position_size = 0.0
+
+    state[ST_CAPITAL] = capital
+    state[ST_POSITION] = position
+    state[ST_POSITION_SIZE] = position_size
+    state[ST_N_TRADES] = n_trades
+    return n
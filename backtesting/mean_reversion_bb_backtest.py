@@ -12,6 +12,7 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
 
@@ -560,40 +561,42 @@ class MeanReversionBBBacktester:
                 'final_capital': final_capital
             }
         
-        winning = [t for t in trades if t['pnl'] > 0]
-        losing = [t for t in trades if t['pnl'] < 0]
+        # Reducciones de NumPy sobre un único array de PnL (sin listas intermedias)
+        pnls = np.fromiter((t['pnl'] for t in trades), dtype=np.float64, count=len(trades))
+        win_pnls = pnls[pnls > 0]
+        loss_pnls = pnls[pnls < 0]
+        n_wins = len(win_pnls)
+        n_losses = len(loss_pnls)
         
-        win_rate = len(winning) / len(trades) if trades else 0
+        win_rate = n_wins / len(pnls)
         
-        gross_profit = sum(t['pnl'] for t in winning)
-        gross_loss = abs(sum(t['pnl'] for t in losing))
+        gross_profit = float(win_pnls.sum())
+        gross_loss = abs(float(loss_pnls.sum()))
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
         
-        avg_win = np.mean([t['pnl'] for t in winning]) if winning else 0
-        avg_loss = np.mean([t['pnl'] for t in losing]) if losing else 0
+        avg_win = win_pnls.mean() if n_wins else 0
+        avg_loss = loss_pnls.mean() if n_losses else 0
         
         # Max drawdown
-        peak = equity_curve[0] if equity_curve else self.initial_capital
-        max_dd = 0
-        for eq in equity_curve:
-            if eq > peak:
-                peak = eq
-            dd = (peak - eq) / peak if peak > 0 else 0
-            if dd > max_dd:
-                max_dd = dd
-        
-        # Por tipo de salida
-        sl_exits = len([t for t in trades if t['exit_reason'] == 'SL'])
-        tp_exits = len([t for t in trades if t['exit_reason'] == 'TP'])
-        signal_exits = len([t for t in trades if t['exit_reason'] == 'SIGNAL'])
+        equity = np.asarray(equity_curve if equity_curve else [self.initial_capital], dtype=np.float64)
+        peaks = np.maximum.accumulate(equity)
+        drawdowns = np.divide(peaks - equity, peaks, out=np.zeros_like(equity), where=peaks > 0)
+        max_dd = max(0.0, float(drawdowns.max()))
+        
+        # Por tipo de salida y dirección (una sola pasada)
+        exit_counts = Counter(t['exit_reason'] for t in trades)
+        type_counts = Counter(t['type'] for t in trades)
+        sl_exits = exit_counts['SL']
+        tp_exits = exit_counts['TP']
+        signal_exits = exit_counts['SIGNAL']
         
         return {
             'total_pnl': total_pnl,
             'return_pct': (total_pnl / self.initial_capital) * 100,
             'final_capital': final_capital,
             'total_trades': len(trades),
-            'winning_trades': len(winning),
-            'losing_trades': len(losing),
+            'winning_trades': n_wins,
+            'losing_trades': n_losses,
             'win_rate': win_rate,
             'profit_factor': profit_factor,
             'avg_win': avg_win,
@@ -604,8 +607,8 @@ class MeanReversionBBBacktester:
             'sl_exits': sl_exits,
             'tp_exits': tp_exits,
             'signal_exits': signal_exits,
-            'long_trades': len([t for t in trades if t['type'] == 'LONG']),
-            'short_trades': len([t for t in trades if t['type'] == 'SHORT'])
+            'long_trades': type_counts['LONG'],
+            'short_trades': type_counts['SHORT']
         }
     
     def plot_results(self, results: Dict[str, Any], save_path: Optional[str] = None):
@@ -1,8 +1,12 @@
 import sys
 import os
+import functools
+import multiprocessing
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Optional, Type
 
 # Agregar el directorio raíz al path para importaciones
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -10,19 +14,69 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from strategies.simple_time_strategy import SimpleTimeStrategy
 from unified_backtest_engine import run_strategy_backtest
 from data_manager import get_backtest_data
+from backtesting._bt_core import (
+    run_bt, run_sweep, resolve_signals, to_ticks, trades_to_records,
+    TYPE_LONG, EXIT_REASONS, SWEEP_COLUMNS
+)
+from backtesting._data_cache import cached, extract_ohlc
+from backtesting._polars_adapter import ensure_pandas
+
+try:
+    # Ahead-of-time compiled kernel (python backtesting/_aot_build.py); skips the JIT warm-up
+    from backtesting._bt_core_aot import run_bt as _run_bt_aot, run_bt_i8 as _run_bt_aot_i8
+    AOT_AVAILABLE = True
+except ImportError:
+    AOT_AVAILABLE = False
+
+
+def _select_kernel(ticks: np.ndarray):
+    """Returns the AOT kernel matching the tick dtype when it is built, else the JIT one."""
+    if not AOT_AVAILABLE:
+        return run_bt
+    return _run_bt_aot_i8 if ticks.dtype == np.int64 else _run_bt_aot
+
+
+@functools.lru_cache(maxsize=32)
+def _extract_params(strategy_class: Type) -> tuple:
+    """
+    Returns (sl_tp_mode, sl_pips, tp_pips, hold_seconds, pip_size) for a strategy class.
+
+    Strategy parameters are static per class, so repeated backtests and sweeps read
+    them once instead of instantiating and querying get_parameters() on every call.
+    """
+    params = strategy_class().get_parameters()
+    return (
+        params.get("sl_tp_mode", "fixed_pips"),
+        params.get("sl_pips", 100.0),
+        params.get("tp_pips", 300.0),
+        params.get("hold_seconds", 120),
+        params.get("pip_size", 0.0001)
+    )
+
+
+# Fixed-shape trade record (one slot per field, no per-trade dict)
+BacktestTrade = namedtuple(
+    'BacktestTrade', 'entry_time exit_time entry_price exit_price pnl type exit_reason position_size'
+)
 
 
 class BacktestingEngine:
     """
-    Backtesting engine for SimpleTimeStrategy.
+    Backtesting engine for SimpleTimeStrategy and other time-based strategies.
+
+    The strategy class is a parameter, so symbol variants (different pip_size or
+    SL/TP in get_parameters) share this engine and its single compiled kernel.
     """
 
-    def __init__(self, initial_capital: float = 10000.0, risk_per_trade: float = 0.01, commission: float = 0.0001):
+    def __init__(self, initial_capital: float = 10000.0, risk_per_trade: float = 0.01, commission: float = 0.0001,
+                 strategy_class: Type = SimpleTimeStrategy):
+        self.strategy_class = strategy_class
         self.initial_capital = initial_capital
         self.risk_per_trade = risk_per_trade
         self.commission = commission
 
-    def backtest(self, data: pd.DataFrame) -> Dict[str, Any]:
+    @staticmethod
+    def _validate_data(data: pd.DataFrame) -> None:
         if not isinstance(data, pd.DataFrame) or data.empty:
             raise ValueError("Data must be a non-empty pandas DataFrame")
 
@@ -30,223 +84,138 @@ class BacktestingEngine:
         if not all(col in data.columns for col in required_columns):
             raise ValueError(f"Data must contain columns: {required_columns}")
 
-        strategy = SimpleTimeStrategy()
-        params = strategy.get_parameters()
-        sl_tp_mode = params.get("sl_tp_mode", "fixed_pips")
-        sl_pips = params.get("sl_pips", 100.0)
-        tp_pips = params.get("tp_pips", 300.0)
-        hold_seconds = params.get("hold_seconds", 120)
-        pip_size = params.get("pip_size", 0.0001)
-
-        capital = self.initial_capital
-        position = 0  # 0: no position, 1: long, -1: short
-        entry_price = 0.0
-        position_size = 0.0
-        entry_time = None
-        sl_price = None
-        tp_price = None
-        trades = []
-        equity_curve = [capital]
-
-        for i in range(len(data)):
-            current_bar = data.iloc[i]
-            signal = strategy.generate_signal(data, i)
-
-            if position != 0:
-                # SL/TP check (intrabar)
-                if sl_tp_mode == "fixed_pips" and sl_price is not None and tp_price is not None:
-                    if position == 1:
-                        if current_bar['Low'] <= sl_price:
-                            exit_price = sl_price
-                            pnl = (exit_price - entry_price) * position_size
-                            capital += pnl - (position_size * exit_price * self.commission)
-                            trades.append({
-                                'entry_time': entry_time,
-                                'exit_time': data.index[i],
-                                'entry_price': entry_price,
-                                'exit_price': exit_price,
-                                'pnl': pnl,
-                                'type': 'long',
-                                'exit_reason': 'sl'
-                            })
-                            position = 0
-                            position_size = 0.0
-                            entry_time = None
-                            sl_price = None
-                            tp_price = None
-                        elif current_bar['High'] >= tp_price:
-                            exit_price = tp_price
-                            pnl = (exit_price - entry_price) * position_size
-                            capital += pnl - (position_size * exit_price * self.commission)
-                            trades.append({
-                                'entry_time': entry_time,
-                                'exit_time': data.index[i],
-                                'entry_price': entry_price,
-                                'exit_price': exit_price,
-                                'pnl': pnl,
-                                'type': 'long',
-                                'exit_reason': 'tp'
-                            })
-                            position = 0
-                            position_size = 0.0
-                            entry_time = None
-                            sl_price = None
-                            tp_price = None
-                    elif position == -1:
-                        if current_bar['High'] >= sl_price:
-                            exit_price = sl_price
-                            pnl = (entry_price - exit_price) * position_size
-                            capital += pnl - (position_size * exit_price * self.commission)
-                            trades.append({
-                                'entry_time': entry_time,
-                                'exit_time': data.index[i],
-                                'entry_price': entry_price,
-                                'exit_price': exit_price,
-                                'pnl': pnl,
-                                'type': 'short',
-                                'exit_reason': 'sl'
-                            })
-                            position = 0
-                            position_size = 0.0
-                            entry_time = None
-                            sl_price = None
-                            tp_price = None
-                        elif current_bar['Low'] <= tp_price:
-                            exit_price = tp_price
-                            pnl = (entry_price - exit_price) * position_size
-                            capital += pnl - (position_size * exit_price * self.commission)
-                            trades.append({
-                                'entry_time': entry_time,
-                                'exit_time': data.index[i],
-                                'entry_price': entry_price,
-                                'exit_price': exit_price,
-                                'pnl': pnl,
-                                'type': 'short',
-                                'exit_reason': 'tp'
-                            })
-                            position = 0
-                            position_size = 0.0
-                            entry_time = None
-                            sl_price = None
-                            tp_price = None
-
-                # Time-based close
-                if position != 0 and entry_time is not None:
-                    time_diff_seconds = (data.index[i] - entry_time).total_seconds() if hasattr(data.index[i], 'to_pydatetime') else 0
-                    if time_diff_seconds >= hold_seconds:
-                        exit_price = current_bar['Close']
-                        pnl = (exit_price - entry_price) * position_size if position == 1 else (entry_price - exit_price) * position_size
-                        capital += pnl - (position_size * exit_price * self.commission)
-                        trades.append({
-                            'entry_time': entry_time,
-                            'exit_time': data.index[i],
-                            'entry_price': entry_price,
-                            'exit_price': exit_price,
-                            'pnl': pnl,
-                            'type': 'long' if position == 1 else 'short',
-                            'exit_reason': 'time'
-                        })
-                        position = 0
-                        position_size = 0.0
-                        entry_time = None
-                        sl_price = None
-                        tp_price = None
-
-            if signal == 'buy' and position == 0:
-                entry_price = current_bar['Close']
-                position_size = (capital * self.risk_per_trade) / entry_price
-                position = 1
-                entry_time = data.index[i]
-                if sl_tp_mode == "fixed_pips":
-                    sl_price = entry_price - (sl_pips * pip_size)
-                    tp_price = entry_price + (tp_pips * pip_size)
-                capital -= position_size * entry_price * self.commission
-
-            elif signal == 'sell' and position == 1:
-                exit_price = current_bar['Close']
-                pnl = (exit_price - entry_price) * position_size
-                capital += pnl - (position_size * exit_price * self.commission)
-                trades.append({
-                    'entry_time': data.index[i-1] if i > 0 else data.index[i],
-                    'exit_time': data.index[i],
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'pnl': pnl,
-                    'type': 'long'
-                })
-                position = 0
-                position_size = 0.0
-
-            elif signal == 'sell' and position == 0:
-                entry_price = current_bar['Close']
-                position_size = (capital * self.risk_per_trade) / entry_price
-                position = -1
-                entry_time = data.index[i]
-                if sl_tp_mode == "fixed_pips":
-                    sl_price = entry_price + (sl_pips * pip_size)
-                    tp_price = entry_price - (tp_pips * pip_size)
-                capital -= position_size * entry_price * self.commission
-
-            elif signal == 'buy' and position == -1:
-                exit_price = current_bar['Close']
-                pnl = (entry_price - exit_price) * position_size
-                capital += pnl - (position_size * exit_price * self.commission)
-                trades.append({
-                    'entry_time': data.index[i-1] if i > 0 else data.index[i],
-                    'exit_time': data.index[i],
-                    'entry_price': entry_price,
-                    'exit_price': exit_price,
-                    'pnl': pnl,
-                    'type': 'short',
-                    'exit_reason': 'signal'
-                })
-                position = 0
-                position_size = 0.0
-                entry_time = None
-                sl_price = None
-                tp_price = None
-
-            equity_curve.append(capital)
+    @staticmethod
+    def _price_arrays(data: pd.DataFrame, pip_size: float):
+        """Returns (high_ticks, low_ticks, close, index_ns, time_exit) for the kernel."""
+        # Column arrays and ns timestamps are cached per DataFrame, so repeated
+        # backtests over the same frame skip the pandas conversions
+        ohlc = extract_ohlc(data)
+
+        # SL/TP checks run on an integer price grid of one point (a tenth of a pip),
+        # so 5-decimal quotes stay exact and the intrabar compares are integer ops.
+        # The quantized arrays are cached per DataFrame and tick size as well.
+        tick_size = pip_size / 10
+        high_ticks, low_ticks = cached(
+            data, f'ticks:{tick_size!r}',
+            lambda _: (to_ticks(ohlc.high, tick_size), to_ticks(ohlc.low, tick_size))
+        )
+
+        # Only a DatetimeIndex enables the time exit; the check is resolved once, not per bar
+        return high_ticks, low_ticks, ohlc.close, ohlc.index_ns, ohlc.time_indexed
+
+    def backtest(self, data: pd.DataFrame) -> Dict[str, Any]:
+        data = ensure_pandas(data)
+        self._validate_data(data)
+
+        strategy = self.strategy_class()
+        sl_tp_mode, sl_pips, tp_pips, hold_seconds, pip_size = _extract_params(self.strategy_class)
+
+        # Strategy signals are resolved up front so the loop only sees an int8 array
+        signals = resolve_signals(strategy, data)
+
+        high_ticks, low_ticks, close_arr, index_ns, time_exit = self._price_arrays(data, pip_size)
+
+        trades_raw, equity_curve = _select_kernel(high_ticks)(
+            high_ticks, low_ticks, close_arr, index_ns, signals,
+            float(self.initial_capital), float(self.risk_per_trade), float(self.commission),
+            float(sl_pips), float(tp_pips), float(pip_size), int(hold_seconds * 1_000_000_000),
+            sl_tp_mode == "fixed_pips", time_exit
+        )
+        capital = float(equity_curve[-1])
+        trades_arr = trades_to_records(trades_raw)
+
+        index = data.index
+        trades = [
+            BacktestTrade(
+                entry_time=index[entry_idx],
+                exit_time=index[exit_idx],
+                entry_price=entry_price,
+                exit_price=exit_price,
+                pnl=pnl,
+                type='long' if type_code == TYPE_LONG else 'short',
+                exit_reason=EXIT_REASONS[exit_reason_code],
+                position_size=position_size
+            )
+            for (entry_idx, exit_idx, entry_price, exit_price, pnl,
+                 type_code, exit_reason_code, position_size) in trades_arr.tolist()
+        ]
 
         total_pnl = capital - self.initial_capital
-        winning_trades = [t for t in trades if t['pnl'] > 0]
-        losing_trades = [t for t in trades if t['pnl'] < 0]
-        win_rate = len(winning_trades) / len(trades) if trades else 0
-        avg_win = np.mean([t['pnl'] for t in winning_trades]) if winning_trades else 0
-        avg_loss = np.mean([t['pnl'] for t in losing_trades]) if losing_trades else 0
-        profit_factor = sum(t['pnl'] for t in winning_trades) / abs(sum(t['pnl'] for t in losing_trades)) if losing_trades else float('inf')
+        pnls = trades_arr['pnl']
+        win_pnls = pnls[pnls > 0]
+        loss_pnls = pnls[pnls < 0]
+        n_trades = len(pnls)
+        n_wins = len(win_pnls)
+        n_losses = len(loss_pnls)
+        win_rate = n_wins / n_trades if n_trades else 0
+        avg_win = win_pnls.mean() if n_wins else 0
+        avg_loss = loss_pnls.mean() if n_losses else 0
+        profit_factor = win_pnls.sum() / abs(loss_pnls.sum()) if n_losses else float('inf')
         max_drawdown = self._calculate_max_drawdown(equity_curve)
 
+        # Commission on both legs of every closed trade, in a single vectorized pass
+        total_commission = float((
+            self.commission * trades_arr['position_size'] * (trades_arr['entry_price'] + trades_arr['exit_price'])
+        ).sum())
+
         return {
             'total_pnl': total_pnl,
             'win_rate': win_rate,
-            'total_trades': len(trades),
-            'winning_trades': len(winning_trades),
-            'losing_trades': len(losing_trades),
+            'total_trades': n_trades,
+            'winning_trades': n_wins,
+            'losing_trades': n_losses,
             'avg_win': avg_win,
             'avg_loss': avg_loss,
             'profit_factor': profit_factor,
             'max_drawdown': max_drawdown,
             'final_capital': capital,
+            'total_commission': total_commission,
             'trades': trades,
+            'trades_array': trades_arr,
             'equity_curve': equity_curve,
             'strategy_parameters': strategy.get_parameters()
         }
 
-    def _calculate_max_drawdown(self, equity_curve: List[float]) -> float:
-        peak = equity_curve[0]
-        max_dd = 0.0
-        for value in equity_curve:
-            if value > peak:
-                peak = value
-            dd = (peak - value) / peak
-            if dd > max_dd:
-                max_dd = dd
-        return max_dd
+    def sweep(self, data: pd.DataFrame, sl_grid, tp_grid, hold_grid) -> pd.DataFrame:
+        """
+        Backtests every (sl_pips, tp_pips, hold_seconds) combination of the given grids.
+
+        Signals and price arrays are built once and shared; the runs execute in
+        parallel across cores when Numba is available.
+
+        Returns:
+            DataFrame with one row per combination (columns: SWEEP_COLUMNS)
+        """
+        data = ensure_pandas(data)
+        self._validate_data(data)
 
+        strategy = self.strategy_class()
+        sl_tp_mode, _, _, _, pip_size = _extract_params(self.strategy_class)
 
-def run_backtest(data: pd.DataFrame, initial_capital: float = 10000.0, risk_per_trade: float = 0.01, commission: float = 0.0001) -> Dict[str, Any]:
-    engine = BacktestingEngine(initial_capital=initial_capital, risk_per_trade=risk_per_trade, commission=commission)
+        signals = resolve_signals(strategy, data)
+        high_ticks, low_ticks, close_arr, index_ns, time_exit = self._price_arrays(data, pip_size)
+
+        results = run_sweep(
+            high_ticks, low_ticks, close_arr, index_ns, signals,
+            float(self.initial_capital), float(self.risk_per_trade), float(self.commission),
+            np.asarray(sl_grid, dtype=np.float64), np.asarray(tp_grid, dtype=np.float64),
+            np.asarray(hold_grid, dtype=np.float64), float(pip_size),
+            sl_tp_mode == "fixed_pips", time_exit
+        )
+        df = pd.DataFrame(results, columns=list(SWEEP_COLUMNS))
+        df['total_trades'] = df['total_trades'].astype(np.int64)
+        return df
+
+    def _calculate_max_drawdown(self, equity_curve: np.ndarray) -> float:
+        equity = np.asarray(equity_curve, dtype=np.float64)
+        peaks = np.maximum.accumulate(equity)
+        return float(((peaks - equity) / peaks).max())
+
+
+def run_backtest(data: pd.DataFrame, initial_capital: float = 10000.0, risk_per_trade: float = 0.01, commission: float = 0.0001,
+                 strategy_class: Type = SimpleTimeStrategy) -> Dict[str, Any]:
+    engine = BacktestingEngine(initial_capital=initial_capital, risk_per_trade=risk_per_trade, commission=commission,
+                               strategy_class=strategy_class)
     return engine.backtest(data)
 
 
@@ -281,6 +250,46 @@ def run_backtest_with_oanda(symbol: str = "EURUSD", timeframe: str = "H1", count
     )
 
 
+def run_backtest_portfolio(symbols: List[str], timeframe: str = "H1", count: int = 1000,
+                           initial_capital: float = 10000.0, risk_per_trade: float = 0.01,
+                           commission: float = 0.0001, max_workers: Optional[int] = None,
+                           verbose: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Ejecuta run_backtest_with_oanda para varios símbolos en paralelo, un proceso por símbolo.
+
+    Cada símbolo es independiente (descarga de datos + backtest), así que se reparten
+    en un ProcessPoolExecutor con contexto 'spawn' (no se copian DataFrames por fork).
+
+    Args:
+        symbols: Lista de símbolos a evaluar
+        max_workers: Procesos máximos (por defecto, uno por CPU sin superar len(symbols))
+        verbose: Mostrar logs detallados en cada proceso
+        (resto de argumentos como en run_backtest_with_oanda)
+
+    Returns:
+        Dict símbolo -> resultados del backtesting (o {"error": ...} si falló)
+    """
+    if not symbols:
+        return {}
+
+    workers = max_workers or min(len(symbols), os.cpu_count() or 1)
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            symbol: executor.submit(
+                run_backtest_with_oanda, symbol, timeframe, count,
+                initial_capital, risk_per_trade, commission, verbose
+            )
+            for symbol in symbols
+        }
+        for symbol, future in futures.items():
+            try:
+                results[symbol] = future.result()
+            except Exception as e:
+                results[symbol] = {"error": str(e)}
+    return results
+
+
 if __name__ == "__main__":
     """
     Prueba del backtesting con SimpleTimeStrategy
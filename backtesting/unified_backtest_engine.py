@@ -6,9 +6,13 @@ con MetaTrader5 como fallback. Soporta múltiples estrategias.
 """
 import os
 import sys
+import itertools
+import multiprocessing
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Any, Optional, Type
+from concurrent.futures import ProcessPoolExecutor
+from collections.abc import Sequence
+from typing import Dict, List, Any, Optional, Type, Union
 from datetime import datetime, timedelta
 
 # Agregar el directorio raíz al path si es necesario
@@ -24,6 +28,77 @@ from strategies.strategy_base import StrategyBase
 # Importar data manager
 from backtesting.data_manager import BacktestDataManager, get_backtest_data
 from utils.utils import Utils
+from backtesting._polars_adapter import ensure_pandas
+from backtesting._bt_core import (
+    resolve_signals, trades_to_records, SIGNAL_BUY, TYPE_LONG, EXIT_REASONS, EXIT_SL, EXIT_TP
+)
+from backtesting._unified_core import (
+    _backtest_loop, new_state, new_buffers, next_signal_index,
+    ST_CAPITAL, ST_POSITION, ST_ENTRY_PRICE, ST_POSITION_SIZE, ST_ENTRY_IDX,
+    ST_SL_PRICE, ST_TP_PRICE, ST_HAS_LEVELS, ST_N_TRADES
+)
+
+try:
+    # Loop compilado ahead-of-time (python backtesting/_aot_build.py); evita el warm-up del JIT
+    from backtesting._bt_core_aot import backtest_loop as _backtest_loop
+except ImportError:
+    pass
+
+
+class LazyTrades(Sequence):
+    """
+    Lista de trades (dicts) que se construye en el primer acceso.
+
+    Las métricas salen del array estructurado (results['trades_array']), así que un
+    backtest cuyo consumidor solo mira el resumen (p.ej. un barrido de parámetros) no
+    paga la creación de un dict por trade. len() no materializa la lista.
+    """
+    __slots__ = ('_records', '_index', '_dicts')
+    
+    def __init__(self, records: np.ndarray, index: pd.Index):
+        self._records = records
+        self._index = index
+        self._dicts = None
+    
+    def to_list(self) -> List[Dict]:
+        """Devuelve (y cachea) los trades como lista de dicts."""
+        if self._dicts is None:
+            index = self._index
+            self._dicts = [
+                {
+                    'entry_time': index[entry_idx],
+                    'exit_time': index[exit_idx],
+                    'entry_price': entry_price,
+                    'exit_price': exit_price,
+                    'pnl': pnl,
+                    'type': 'long' if type_code == TYPE_LONG else 'short',
+                    'exit_reason': EXIT_REASONS[exit_reason_code],
+                    'position_size': position_size
+                }
+                for (entry_idx, exit_idx, entry_price, exit_price, pnl,
+                     type_code, exit_reason_code, position_size)
+                in self._records.tolist()
+            ]
+        return self._dicts
+    
+    def __len__(self) -> int:
+        return len(self._records)
+    
+    def __getitem__(self, key):
+        return self.to_list()[key]
+    
+    def __iter__(self):
+        return iter(self.to_list())
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, LazyTrades):
+            other = other.to_list()
+        return self.to_list() == other
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return repr(self.to_list())
 
 
 class UnifiedBacktestingEngine:
@@ -142,7 +217,7 @@ class UnifiedBacktestingEngine:
         Ejecuta el backtesting en los datos proporcionados.
         
         Args:
-            data: DataFrame con datos OHLCV
+            data: DataFrame con datos OHLCV (pandas, o Polars con la fecha en una columna Datetime)
             strategy_class: Clase de estrategia a usar
             symbol: Símbolo del instrumento (default: EURUSD)
             verbose: Mostrar logs detallados
@@ -150,6 +225,9 @@ class UnifiedBacktestingEngine:
         Returns:
             Dict con resultados del backtesting
         """
+        # Un pl.DataFrame se convierte una sola vez aquí (columnas exportadas sin copia)
+        data = ensure_pandas(data)
+        
         # Validar datos
         if not isinstance(data, pd.DataFrame) or data.empty:
             raise ValueError("Data debe ser un DataFrame no vacío")
@@ -168,181 +246,117 @@ class UnifiedBacktestingEngine:
         tp_pips = params.get("tp_pips", 300.0)
         pip_size = params.get("pip_size", 0.0001)
         
-        # Variables de estado
-        capital = self.initial_capital
-        position = 0  # 0: sin posición, 1: long, -1: short
-        entry_price = 0.0
-        position_size = 0.0
-        entry_time = None
-        sl_price = None
-        tp_price = None
-        trades = []
-        equity_curve = [capital]
+        n = len(data)
         
         if verbose:
             print(f"{Utils.dateprint()} - [Backtesting] Ejecutando con {strategy_class.__name__}")
-            print(f"   Capital inicial: ${capital:,.2f}")
+            print(f"   Capital inicial: ${self.initial_capital:,.2f}")
             print(f"   SL/TP Mode: {sl_tp_mode}")
         
-        # Loop principal de backtesting
-        for i in range(len(data)):
-            current_bar = data.iloc[i]
-            current_time = data.index[i]
+        # Señales precalculadas una sola vez (int8: 1 buy, -1 sell, 0 hold): se usa
+        # strategy.generate_signals_vectorized si existe y, si no, generate_signal barra a barra.
+        # El loop compilado solo ve arrays de NumPy
+        signals = resolve_signals(strategy, data)
+        # Columnas OHLC como arrays float64 contiguos, extraídos una vez por backtest
+        high_arr, low_arr, close_arr = (
+            np.ascontiguousarray(data[col].to_numpy(dtype=np.float64)) for col in ('High', 'Low', 'Close')
+        )
+        
+        # Cerrar la posición abierta ante una nueva señal. Los trades solo se registran al
+        # cerrarse (siempre con exit_time), así que las posiciones abiertas además de la
+        # actual (que lleva el estado del loop) son siempre 0: la condición no depende de
+        # la barra y no hace falta recorrer la lista de trades.
+        close_on_signal = bool(params.get('close_before_open', True)) or params.get('max_open_positions', 1) <= 0
+        sl_tp_fixed = sl_tp_mode == "fixed_pips"
+        # Constantes del backtest leídas una sola vez, fuera del loop de entradas
+        commission = float(self.commission)
+        risk_per_trade = self.risk_per_trade
+        # Callbacks de la estrategia resueltos una vez y offsets del fallback en precio
+        calc_position_size = strategy.calculate_position_size
+        calc_sl_tp = strategy.calculate_sl_tp
+        sl_offset = sl_pips * pip_size
+        tp_offset = tp_pips * pip_size
+        
+        state = new_state(float(self.initial_capital))
+        # equity_curve es un array float64 preasignado (n + 1 valores) que el loop
+        # compilado rellena por índice; se devuelve tal cual en los resultados
+        trades_buf, equity_curve = new_buffers(n)
+        equity_curve[0] = self.initial_capital
+        
+        # El loop compilado se detiene en cada barra que abre posición: el tamaño y los
+        # niveles SL/TP los decide la estrategia (Python) y luego se reanuda en i + 1
+        next_signal = next_signal_index(signals)
+        i = _backtest_loop(0, high_arr, low_arr, close_arr, signals, next_signal, state, trades_buf, equity_curve,
+                           commission, sl_tp_fixed, close_on_signal)
+        while i < n:
+            # Lado de la entrada como entero (1 buy, -1 sell); el string solo se usa
+            # en la llamada a la API de la estrategia
+            position = int(signals[i])
+            action = 'buy' if position == SIGNAL_BUY else 'sell'
+            capital = float(state[ST_CAPITAL])
+            entry_price = float(close_arr[i])
             
-            # Generar señal
-            signal = strategy.generate_signal(data, i)
+            # Calcular tamaño de posición usando la estrategia
+            try:
+                position_size = calc_position_size(
+                    symbol=symbol,  # Usar símbolo real
+                    equity=capital,
+                    entry_price=entry_price
+                )
+            except Exception as e:
+                # Fallback a cálculo simple
+                position_size = (capital * risk_per_trade) / sl_offset
             
-            # Gestión de posiciones abiertas
-            if position != 0:
-                # Verificar SL/TP
-                if sl_tp_mode == "fixed_pips" and sl_price is not None and tp_price is not None:
-                    exit_occurred = False
-                    
-                    if position == 1:  # Long
-                        if current_bar['Low'] <= sl_price:
-                            # Stop Loss hit
-                            exit_price = sl_price
-                            exit_reason = 'sl'
-                            exit_occurred = True
-                        elif current_bar['High'] >= tp_price:
-                            # Take Profit hit
-                            exit_price = tp_price
-                            exit_reason = 'tp'
-                            exit_occurred = True
-                            
-                    elif position == -1:  # Short
-                        if current_bar['High'] >= sl_price:
-                            # Stop Loss hit
-                            exit_price = sl_price
-                            exit_reason = 'sl'
-                            exit_occurred = True
-                        elif current_bar['Low'] <= tp_price:
-                            # Take Profit hit
-                            exit_price = tp_price
-                            exit_reason = 'tp'
-                            exit_occurred = True
-                    
-                    # Procesar salida
-                    if exit_occurred:
-                        pnl = self._calculate_pnl(position, entry_price, exit_price, position_size)
-                        capital += pnl - (position_size * exit_price * self.commission)
-                        
-                        trades.append({
-                            'entry_time': entry_time,
-                            'exit_time': current_time,
-                            'entry_price': entry_price,
-                            'exit_price': exit_price,
-                            'pnl': pnl,
-                            'type': 'long' if position == 1 else 'short',
-                            'exit_reason': exit_reason,
-                            'position_size': position_size
-                        })
-                        
-                        # Reset posición
-                        position = 0
-                        position_size = 0.0
-                        entry_time = None
-                        sl_price = None
-                        tp_price = None
-                        
-                        if verbose and len(trades) % 10 == 0:
-                            print(f"{Utils.dateprint()} - [Backtesting] Trade #{len(trades)} - PnL: ${pnl:.2f}")
-                
-                # Verificar si estrategia quiere cerrar antes de abrir nueva posición
-                if position != 0 and signal in ['buy', 'sell']:
-                    should_close = params.get('close_before_open', True)
-                    max_positions = params.get('max_open_positions', 1)
-                    
-                    if should_close or len([t for t in trades if 'exit_time' not in t or t['exit_time'] is None]) >= max_positions:
-                        # Cerrar posición actual
-                        exit_price = current_bar['Close']
-                        pnl = self._calculate_pnl(position, entry_price, exit_price, position_size)
-                        capital += pnl - (position_size * exit_price * self.commission)
-                        
-                        trades.append({
-                            'entry_time': entry_time,
-                            'exit_time': current_time,
-                            'entry_price': entry_price,
-                            'exit_price': exit_price,
-                            'pnl': pnl,
-                            'type': 'long' if position == 1 else 'short',
-                            'exit_reason': 'strategy_close',
-                            'position_size': position_size
-                        })
-                        
-                        position = 0
-                        position_size = 0.0
-                        entry_time = None
-                        sl_price = None
-                        tp_price = None
+            # Calcular SL/TP usando la estrategia
+            try:
+                sl_price, tp_price = calc_sl_tp(
+                    symbol=symbol,  # Usar símbolo real
+                    action=action,
+                    entry_price=entry_price
+                )
+            except Exception as e:
+                # Fallback a cálculo simple
+                sl_price = entry_price - position * sl_offset
+                tp_price = entry_price + position * tp_offset
             
-            # Procesar nuevas señales
-            if position == 0 and signal in ['buy', 'sell']:
-                entry_price = current_bar['Close']
-                
-                # Calcular tamaño de posición usando la estrategia
-                try:
-                    position_size = strategy.calculate_position_size(
-                        symbol=symbol,  # Usar símbolo real
-                        equity=capital,
-                        entry_price=entry_price
-                    )
-                except Exception as e:
-                    # Fallback a cálculo simple
-                    position_size = (capital * self.risk_per_trade) / (sl_pips * pip_size)
-                
-                # Calcular SL/TP usando la estrategia
-                try:
-                    sl_price, tp_price = strategy.calculate_sl_tp(
-                        symbol=symbol,  # Usar símbolo real
-                        action=signal,
-                        entry_price=entry_price
-                    )
-                except Exception as e:
-                    # Fallback a cálculo simple
-                    if signal == 'buy':
-                        sl_price = entry_price - (sl_pips * pip_size)
-                        tp_price = entry_price + (tp_pips * pip_size)
-                    else:  # sell
-                        sl_price = entry_price + (sl_pips * pip_size)
-                        tp_price = entry_price - (tp_pips * pip_size)
-                
-                # Abrir posición
-                position = 1 if signal == 'buy' else -1
-                entry_time = current_time
-                
-                # Deducir comisión de entrada
-                capital -= position_size * entry_price * self.commission
+            # Abrir posición y deducir comisión de entrada
+            capital -= position_size * entry_price * commission
+            has_levels = sl_price is not None and tp_price is not None
             
-            # Actualizar equity curve
-            if position != 0:
-                # Calcular PnL no realizado
-                unrealized_pnl = self._calculate_pnl(position, entry_price, current_bar['Close'], position_size)
-                current_equity = capital + unrealized_pnl
-            else:
-                current_equity = capital
+            state[ST_CAPITAL] = capital
+            state[ST_POSITION] = position
+            state[ST_ENTRY_PRICE] = entry_price
+            state[ST_POSITION_SIZE] = position_size
+            state[ST_ENTRY_IDX] = i
+            state[ST_SL_PRICE] = sl_price if has_levels else np.nan
+            state[ST_TP_PRICE] = tp_price if has_levels else np.nan
+            state[ST_HAS_LEVELS] = 1.0 if has_levels else 0.0
             
-            equity_curve.append(current_equity)
-        
-        # Cerrar posición final si está abierta
-        if position != 0:
-            exit_price = data.iloc[-1]['Close']
-            pnl = self._calculate_pnl(position, entry_price, exit_price, position_size)
-            capital += pnl - (position_size * exit_price * self.commission)
+            # Equity de la barra de entrada: se entra al cierre, PnL no realizado = 0
+            equity_curve[i + 1] = capital
             
-            trades.append({
-                'entry_time': entry_time,
-                'exit_time': data.index[-1],
-                'entry_price': entry_price,
-                'exit_price': exit_price,
-                'pnl': pnl,
-                'type': 'long' if position == 1 else 'short',
-                'exit_reason': 'end_of_data',
-                'position_size': position_size
-            })
+            i = _backtest_loop(i + 1, high_arr, low_arr, close_arr, signals, next_signal, state, trades_buf, equity_curve,
+                               commission, sl_tp_fixed, close_on_signal)
+        
+        capital = float(state[ST_CAPITAL])
+        trades_arr = trades_to_records(trades_buf[:int(state[ST_N_TRADES])])
+        
+        # Los dicts por trade solo se construyen si alguien lee results['trades']
+        trades = LazyTrades(trades_arr, data.index)
+        
+        if verbose:
+            # Cada 10º trade cerrado por SL/TP, en un único write con una sola marca de tiempo
+            trade_numbers = np.arange(1, len(trades_arr) + 1)
+            logged = np.isin(trades_arr['exit_reason_code'], (EXIT_SL, EXIT_TP)) & (trade_numbers % 10 == 0)
+            if logged.any():
+                stamp = Utils.dateprint()
+                sys.stdout.write("".join(
+                    f"{stamp} - [Backtesting] Trade #{k} - PnL: ${pnl:.2f}\n"
+                    for k, pnl in zip(trade_numbers[logged].tolist(), trades_arr['pnl'][logged].tolist())
+                ))
         
         # Calcular métricas
-        results = self._calculate_metrics(capital, trades, equity_curve, strategy.get_parameters())
+        results = self._calculate_metrics(capital, trades, trades_arr, equity_curve, strategy.get_parameters())
         
         if verbose:
             print(f"{Utils.dateprint()} - [Backtesting] ✅ Completado")
@@ -353,19 +367,18 @@ class UnifiedBacktestingEngine:
         
         return results
     
-    def _calculate_pnl(self, position: int, entry_price: float, exit_price: float, position_size: float) -> float:
-        """Calcula PnL de una posición."""
-        if position == 1:  # Long
-            return (exit_price - entry_price) * position_size
-        else:  # Short
-            return (entry_price - exit_price) * position_size
-    
-    def _calculate_metrics(self, final_capital: float, trades: List[Dict], equity_curve: List[float], strategy_params: Dict) -> Dict[str, Any]:
-        """Calcula métricas de performance."""
+    def _calculate_metrics(self, final_capital: float, trades: LazyTrades, trades_arr: np.ndarray,
+                           equity_curve: np.ndarray, strategy_params: Dict) -> Dict[str, Any]:
+        """
+        Calcula métricas de performance.
+        
+        Las estadísticas salen de trades_arr (array estructurado TRADE_DTYPE) con máscaras
+        booleanas; trades (LazyTrades) solo se devuelve tal cual, sin materializar.
+        """
         
         total_pnl = final_capital - self.initial_capital
         
-        if not trades:
+        if len(trades_arr) == 0:
             return {
                 'total_pnl': total_pnl,
                 'win_rate': 0.0,
@@ -378,19 +391,23 @@ class UnifiedBacktestingEngine:
                 'max_drawdown': 0.0,
                 'final_capital': final_capital,
                 'trades': [],
+                'trades_array': trades_arr,
                 'equity_curve': equity_curve,
                 'strategy_parameters': strategy_params
             }
         
-        winning_trades = [t for t in trades if t['pnl'] > 0]
-        losing_trades = [t for t in trades if t['pnl'] < 0]
+        pnls = trades_arr['pnl']
+        win_pnls = pnls[pnls > 0]
+        loss_pnls = pnls[pnls < 0]
+        n_wins = len(win_pnls)
+        n_losses = len(loss_pnls)
         
-        win_rate = len(winning_trades) / len(trades)
-        avg_win = np.mean([t['pnl'] for t in winning_trades]) if winning_trades else 0
-        avg_loss = np.mean([t['pnl'] for t in losing_trades]) if losing_trades else 0
+        win_rate = n_wins / len(pnls)
+        avg_win = win_pnls.mean() if n_wins else 0
+        avg_loss = loss_pnls.mean() if n_losses else 0
         
-        gross_profit = sum(t['pnl'] for t in winning_trades)
-        gross_loss = abs(sum(t['pnl'] for t in losing_trades))
+        gross_profit = float(win_pnls.sum())
+        gross_loss = abs(float(loss_pnls.sum()))
         profit_factor = gross_profit / gross_loss if gross_loss > 0 else float('inf')
         
         max_drawdown = self._calculate_max_drawdown(equity_curve)
@@ -398,9 +415,9 @@ class UnifiedBacktestingEngine:
         return {
             'total_pnl': total_pnl,
             'win_rate': win_rate,
-            'total_trades': len(trades),
-            'winning_trades': len(winning_trades),
-            'losing_trades': len(losing_trades),
+            'total_trades': len(pnls),
+            'winning_trades': n_wins,
+            'losing_trades': n_losses,
             'avg_win': avg_win,
             'avg_loss': avg_loss,
             'profit_factor': profit_factor,
@@ -409,27 +426,23 @@ class UnifiedBacktestingEngine:
             'gross_profit': gross_profit,
             'gross_loss': gross_loss,
             'trades': trades,
+            'trades_array': trades_arr,
             'equity_curve': equity_curve,
             'strategy_parameters': strategy_params,
             'return_percentage': (total_pnl / self.initial_capital) * 100
         }
     
-    def _calculate_max_drawdown(self, equity_curve: List[float]) -> float:
+    def _calculate_max_drawdown(self, equity_curve: np.ndarray) -> float:
         """Calcula drawdown máximo."""
         if len(equity_curve) < 2:
             return 0.0
-            
-        peak = equity_curve[0]
-        max_dd = 0.0
-        
-        for value in equity_curve:
-            if value > peak:
-                peak = value
-            dd = (peak - value) / peak if peak > 0 else 0
-            if dd > max_dd:
-                max_dd = dd
-                
-        return max_dd
+        
+        equity = np.asarray(equity_curve, dtype=np.float64)
+        peaks = np.maximum.accumulate(equity)
+        # Drawdown 0 mientras el pico no sea positivo (evita dividir por <= 0)
+        safe_peaks = np.where(peaks > 0, peaks, 1.0)
+        drawdowns = np.where(peaks > 0, (peaks - equity) / safe_peaks, 0.0)
+        return float(drawdowns.max())
     
     def _determine_data_source(self) -> str:
         """Determina qué fuente de datos se usó."""
@@ -491,6 +504,101 @@ def run_strategy_backtest(
     )
 
 
+def _with_params(strategy_class: Type[StrategyBase], overrides: Dict[str, Any]) -> Type[StrategyBase]:
+    """
+    Subclase de strategy_class con los parámetros de overrides aplicados: se asignan
+    como atributos de la instancia (sl_pips, fixed_lot, ...) y se mezclan en get_parameters().
+    """
+    class Configured(strategy_class):
+        def __init__(self):
+            super().__init__()
+            for name, value in overrides.items():
+                setattr(self, name, value)
+
+        def get_parameters(self) -> dict:
+            params = super().get_parameters()
+            params.update(overrides)
+            return params
+
+    Configured.__name__ = strategy_class.__name__
+    Configured.__qualname__ = strategy_class.__qualname__
+    return Configured
+
+
+# DataFrame del grid en cada proceso worker (se envía una sola vez, en el initializer)
+_GRID_DATA: Optional[pd.DataFrame] = None
+
+
+def _init_grid_worker(data: pd.DataFrame) -> None:
+    global _GRID_DATA
+    _GRID_DATA = data
+
+
+def _grid_backtest(strategy_class: Type[StrategyBase], overrides: Dict[str, Any], symbol: str,
+                   initial_capital: float, risk_per_trade: float, commission: float) -> Dict[str, Any]:
+    engine = UnifiedBacktestingEngine(
+        initial_capital=initial_capital,
+        risk_per_trade=risk_per_trade,
+        commission=commission
+    )
+    return engine.backtest(_GRID_DATA, _with_params(strategy_class, overrides), symbol=symbol)
+
+
+def run_parameter_grid(
+    strategy_class: Type[StrategyBase],
+    param_grid: Union[Dict[str, List[Any]], List[Dict[str, Any]]],
+    data: pd.DataFrame,
+    symbol: str = "EURUSD",
+    initial_capital: float = 10000.0,
+    risk_per_trade: float = 0.01,
+    commission: float = 0.0001,
+    max_workers: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """
+    Ejecuta un backtest por cada combinación de parámetros sobre los mismos datos, en paralelo.
+
+    Los datos se cargan una vez y se envían a cada proceso worker en su initializer
+    (no en cada tarea); cada worker reutiliza además los arrays cacheados del DataFrame
+    entre las configuraciones que le tocan.
+
+    Args:
+        strategy_class: Clase de estrategia (debe ser importable, p.ej. definida en un módulo)
+        param_grid: Dict nombre -> lista de valores (se usa el producto cartesiano)
+                    o lista de dicts con cada configuración
+        data: DataFrame con datos OHLCV
+        symbol: Símbolo del instrumento
+        max_workers: Procesos máximos (por defecto, uno por CPU sin superar el número de configuraciones)
+        (resto de argumentos como en UnifiedBacktestingEngine)
+
+    Returns:
+        Lista con un dict por configuración, en el orden del grid: {"params": ..., **resultados}
+        (o {"params": ..., "error": ...} si falló)
+    """
+    if isinstance(param_grid, dict):
+        names = list(param_grid)
+        configs = [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+    else:
+        configs = [dict(config) for config in param_grid]
+    if not configs:
+        return []
+
+    workers = max_workers or min(len(configs), os.cpu_count() or 1)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_grid_worker, initargs=(data,)) as executor:
+        futures = [
+            executor.submit(_grid_backtest, strategy_class, config, symbol,
+                            initial_capital, risk_per_trade, commission)
+            for config in configs
+        ]
+        for config, future in zip(configs, futures):
+            try:
+                results.append({"params": config, **future.result()})
+            except Exception as e:
+                results.append({"params": config, "error": str(e)})
+    return results
+
+
 if __name__ == "__main__":
     # Test del backtesting con datos de Oanda
     print("=== TEST UNIFIED BACKTESTING ENGINE ===")
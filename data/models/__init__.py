@@ -1,4 +1,4 @@
-from .trade import Trade, TradeStatus
+from .trade import Trade, TradeStatus, TradeSummary, TradeCloseContext, trades_to_ndjson
 from .signal import Signal
 
-__all__ = ['Trade', 'TradeStatus', 'Signal']
+__all__ = ['Trade', 'TradeStatus', 'TradeSummary', 'TradeCloseContext', 'Signal', 'trades_to_ndjson']
@@ -1,7 +1,14 @@
+import json
 from dataclasses import dataclass, field
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import Iterable, NamedTuple, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 
 class TradeStatus(Enum):
@@ -12,7 +19,18 @@ class TradeStatus(Enum):
     ERROR = "error"
 
 
-@dataclass
+# Lookup directo valor -> estado (evita TradeStatus(valor) por cada fila)
+_STATUS_BY_VALUE = {status.value: status for status in TradeStatus}
+
+
+def _numpy_to_python(value):
+    """default de json.dumps: convierte escalares numpy (np.int64, ...) a su valor Python."""
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+@dataclass(slots=True)
 class Trade:
     """
     Modelo de un trade ejecutado.
@@ -103,8 +121,54 @@ class Trade:
             swap=data.get('swap'),
             opened_at=datetime.fromisoformat(data['opened_at']) if data.get('opened_at') else datetime.now(),
             closed_at=datetime.fromisoformat(data['closed_at']) if data.get('closed_at') else None,
-            status=TradeStatus(data.get('status', 'opened')),
+            status=_STATUS_BY_VALUE[data.get('status', 'opened')],
             close_reason=data.get('close_reason'),
             signal_data=data.get('signal_data'),
             market_context=data.get('market_context'),
         )
+    
+    def to_json_bytes(self) -> bytes:
+        """
+        Serializa el trade a JSON (mismas claves y formato que to_dict).
+        Acepta valores numpy (p. ej. profit o ticket leídos de un DataFrame) con
+        orjson y sin él.
+        """
+        if ORJSON_AVAILABLE:
+            return orjson.dumps(self.to_dict(), option=orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(self.to_dict(), default=_numpy_to_python).encode()
+    
+    @classmethod
+    def from_json_bytes(cls, data: bytes) -> 'Trade':
+        """Crea un Trade desde el JSON de to_json_bytes."""
+        return cls.from_dict(orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data))
+
+
+class TradeSummary(NamedTuple):
+    """
+    Vista reducida de un trade para listados (sin fechas ni contexto JSON).
+    status es el valor de TradeStatus tal como está guardado ('opened', 'closed', ...).
+    """
+    id: int
+    ticket: Optional[int]
+    bot_id: str
+    symbol: str
+    action: str
+    volume: float
+    entry_price: float
+    profit: Optional[float]
+    status: str
+
+
+class TradeCloseContext(NamedTuple):
+    """Datos de apertura de un trade necesarios para registrar su cierre."""
+    id: int
+    bot_id: str
+    strategy_name: str
+    symbol: str
+    action: str
+    entry_price: float
+
+
+def trades_to_ndjson(trades: Iterable[Trade]) -> bytes:
+    """Serializa varios trades como NDJSON (un objeto JSON por línea) en una sola pasada."""
+    return b''.join(trade.to_json_bytes() + b'\n' for trade in trades)
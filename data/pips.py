@@ -0,0 +1,38 @@
+"""
+Pips
+
+Tamaño de pip por símbolo y cálculo del profit en pips de un trade.
+Compartido por TradeLogger y TradeSyncService.
+"""
+
+# Tamaño de pip por símbolo; los símbolos no listados se clasifican una vez
+# con _classify_pip_size y se memorizan aquí
+_PIP_SIZE = {
+    "USDJPY": 0.01, "EURJPY": 0.01, "GBPJPY": 0.01, "AUDJPY": 0.01,
+    "NZDJPY": 0.01, "CADJPY": 0.01, "CHFJPY": 0.01,
+    "XAUUSD": 0.1, "XAUEUR": 0.1, "GOLD": 0.1,
+}
+
+
+def _classify_pip_size(symbol: str) -> float:
+    """Determina el tamaño de pip de un símbolo no listado en _PIP_SIZE y lo memoriza."""
+    if "JPY" in symbol:
+        pip_size = 0.01
+    elif "XAU" in symbol or "GOLD" in symbol:
+        pip_size = 0.1
+    else:
+        pip_size = 0.0001
+    _PIP_SIZE[symbol] = pip_size
+    return pip_size
+
+
+def pip_size(symbol: str) -> float:
+    """Tamaño de pip del símbolo (0.01 pares JPY, 0.1 oro, 0.0001 el resto)."""
+    return _PIP_SIZE.get(symbol) or _classify_pip_size(symbol)
+
+
+def profit_pips(symbol: str, action: str, entry_price: float, exit_price: float) -> float:
+    """Profit en pips (redondeado a 1 decimal) de un trade 'buy' o 'sell'."""
+    size = _PIP_SIZE.get(symbol) or _classify_pip_size(symbol)
+    sign = 1 if action[:1] in ("b", "B") else -1
+    return round(sign * (exit_price - entry_price) / size, 1)
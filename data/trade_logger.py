@@ -5,15 +5,61 @@ Servicio que registra todas las operaciones de trading en la base de datos.
 Diseñado para ser inyectado en SimpleTradingDirector.
 """
 from datetime import datetime
-from typing import Optional
+from typing import Iterator, Optional
+from collections import OrderedDict
+from contextlib import contextmanager
+import atexit
 import json
+import queue
+import threading
+import time
+import weakref
 
-from data.models.trade import Trade, TradeStatus
+from data.models.trade import Trade, TradeCloseContext, TradeStatus
 from data.models.signal import Signal
+from data.pips import profit_pips
 from data.repositories.trade_repository import TradeRepository
 from utils.utils import Utils
 from events.event_bus import on_trade_closed
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def _dumps(data: dict) -> str:
+    """
+    Serializa a JSON los datos adjuntos de trades y señales.
+    
+    Usa orjson si está disponible (también acepta claves no str y tipos numpy);
+    si orjson no puede serializar algo se recurre a json.dumps.
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode()
+        except TypeError:
+            pass
+    return json.dumps(data)
+
+
+# Loggers vivos, para guardar sus señales pendientes al salir con un único hook
+# de atexit (sin mantenerlos vivos hasta el final del proceso)
+_LOGGERS: "weakref.WeakSet[TradeLogger]" = weakref.WeakSet()
+
+# Marca en la cola de señales que detiene al hilo escritor (logger recolectado)
+_STOP_WRITER = object()
+
+
+def _flush_all_loggers() -> None:
+    """Hook de atexit: espera a que se guarden las señales de todos los loggers."""
+    for logger in list(_LOGGERS):
+        logger.flush_signals()
+
+
+atexit.register(_flush_all_loggers)
+
 
 class TradeLogger:
     """
@@ -22,16 +68,47 @@ class TradeLogger:
     Crea una base de datos separada para cada cuenta de MT5.
     """
     
-    def __init__(self, account_id: int = None, repository: Optional[TradeRepository] = None):
+    def __init__(
+        self,
+        account_id: int = None,
+        repository: Optional[TradeRepository] = None,
+        signal_batch_size: int = 100,
+        signal_flush_seconds: float = 0.2,
+        signal_queue_size: int = 10000,
+        open_trades_cache_size: int = 1000
+    ):
         """
         Inicializa el Trade Logger.
         
         Args:
             account_id: ID de la cuenta MT5 (para crear DB por cuenta)
-            repository: Repositorio de trades (si no se proporciona, crea uno nuevo)
+            repository: Repositorio de trades (si no se proporciona, usa el compartido de la cuenta)
+            signal_batch_size: Máximo de señales escritas en un solo commit
+            signal_flush_seconds: Tiempo máximo que el escritor espera para completar un lote
+            signal_queue_size: Capacidad de la cola de señales (log_signal bloquea si se llena)
+            open_trades_cache_size: Máximo de trades abiertos recordados para log_trade_closed
         """
         self.account_id = account_id
-        self.repository = repository or TradeRepository(account_id=account_id)
+        self.repository = repository or TradeRepository.shared(account_id=account_id)
+        
+        # Las señales se escriben en segundo plano: log_signal solo las encola y un
+        # hilo escritor las guarda por lotes con save_signals_batch
+        self.signal_batch_size = signal_batch_size
+        self.signal_flush_seconds = signal_flush_seconds
+        self._signal_queue: "queue.Queue[Signal]" = queue.Queue(maxsize=signal_queue_size)
+        self._signal_writer: Optional[threading.Thread] = None
+        self._signal_writer_lock = threading.Lock()
+        # Lote que el hilo escritor está completando (ver _write_signals)
+        self._signal_batch: list = []
+        self._signal_batch_lock = threading.Lock()
+        _LOGGERS.add(self)
+        
+        # Datos de los trades abiertos por este logger que necesita log_trade_closed:
+        # ticket -> TradeCloseContext. Los trades cerrados fuera del logger (SL/TP en
+        # MT5, TradeSyncService) no pasan por log_trade_closed: se descartan los más
+        # antiguos sobre open_trades_cache_size (un descartado se busca en la base de datos)
+        self.open_trades_cache_size = open_trades_cache_size
+        self._open_trades: "OrderedDict[int, TradeCloseContext]" = OrderedDict()
         
         if account_id:
             print(f"{Utils.dateprint()} - [TradeLogger] Database: trades_account_{account_id}.db")
@@ -84,8 +161,8 @@ class TradeLogger:
             tp_price=tp_price,
             opened_at=datetime.now(),
             status=TradeStatus.OPENED,
-            signal_data=json.dumps(signal_data) if signal_data else None,
-            market_context=json.dumps(market_context) if market_context else None,
+            signal_data=_dumps(signal_data) if signal_data else None,
+            market_context=_dumps(market_context) if market_context else None,
         )
         
         # Verificar pausa global antes de guardar
@@ -97,10 +174,37 @@ class TradeLogger:
             pass  # Continuar si no está disponible global_state
         
         trade_id = self.repository.save_trade(trade)
+        self._open_trades[ticket] = TradeCloseContext(trade_id, bot_id, strategy_name, symbol, action, entry_price)
+        self._open_trades.move_to_end(ticket)
+        while len(self._open_trades) > self.open_trades_cache_size:
+            self._open_trades.popitem(last=False)
         print(f"{Utils.dateprint()} - [TradeLogger] Trade #{ticket} logged (ID: {trade_id})")
         
         return trade_id
     
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Agrupa los log_trade_opened / log_trade_closed del bloque en una sola
+        transacción de la base de datos (un único commit en lugar de uno por trade).
+        
+        Útil al registrar muchos trades seguidos (reproducción de sesiones,
+        arranque). Si el bloque falla no queda ninguno registrado. Dentro del bloque
+        las lecturas del mismo hilo ven lo escrito en él (p. ej. cerrar un trade que
+        otro logger abrió en el bloque). Las señales las guarda el hilo escritor al
+        terminar; solo si el bloque las necesita antes (get_recent_signals, cola
+        llena) se guardan las encoladas desde el propio bloque y forman parte de él.
+        """
+        opened_before = set(self._open_trades)
+        try:
+            with self.repository.transaction():
+                yield
+        except BaseException:
+            # Los trades abiertos dentro del bloque se han deshecho
+            for ticket in set(self._open_trades) - opened_before:
+                self._open_trades.pop(ticket, None)
+            raise
+    
     def log_trade_closed(
         self,
         ticket: int,
@@ -124,25 +228,36 @@ class TradeLogger:
         Returns:
             True si se actualizó correctamente
         """
-        trade = self.repository.get_trade_by_ticket(ticket)
+        # Datos de apertura desde la caché; solo si el trade no lo abrió este logger
+        # se leen de la base de datos (únicamente las columnas necesarias)
+        context = self._open_trades.get(ticket) or self.repository.get_close_context(ticket)
         
-        if not trade:
+        if not context:
             print(f"{Utils.dateprint()} - [TradeLogger] WARNING: Trade #{ticket} not found in database")
             return False
         
+        trade_id, bot_id, strategy_name, symbol, action, entry_price = context
+        
         # Calcular pips de profit
-        profit_pips = self._calculate_profit_pips(
-            trade.symbol, trade.action, trade.entry_price, exit_price
-        )
+        profit_pips = self._calculate_profit_pips(symbol, action, entry_price, exit_price)
         
-        trade.exit_price = exit_price
-        trade.profit = profit
-        trade.profit_pips = profit_pips
-        trade.commission = commission
-        trade.swap = swap
-        trade.closed_at = datetime.now()
-        trade.status = TradeStatus.CLOSED
-        trade.close_reason = close_reason
+        trade = Trade(
+            id=trade_id,
+            ticket=ticket,
+            bot_id=bot_id,
+            strategy_name=strategy_name,
+            symbol=symbol,
+            action=action,
+            entry_price=entry_price,
+            exit_price=exit_price,
+            profit=profit,
+            profit_pips=profit_pips,
+            commission=commission,
+            swap=swap,
+            closed_at=datetime.now(),
+            status=TradeStatus.CLOSED,
+            close_reason=close_reason,
+        )
         
         # Verificar pausa global antes de actualizar
         try:
@@ -155,6 +270,7 @@ class TradeLogger:
         success = self.repository.update_trade(trade)
         
         if success:
+            self._open_trades.pop(ticket, None)
             emoji = "✅" if profit > 0 else "❌"
             print(f"{Utils.dateprint()} - [TradeLogger] {emoji} Trade #{ticket} closed: ${profit:.2f} ({profit_pips:.1f} pips)")
             
@@ -186,7 +302,7 @@ class TradeLogger:
         execution_ticket: Optional[int] = None,
         skip_reason: Optional[str] = None,
         indicators_snapshot: Optional[dict] = None
-    ) -> int:
+    ) -> bool:
         """
         Registra una señal generada.
         
@@ -203,7 +319,7 @@ class TradeLogger:
             indicators_snapshot: Estado de indicadores
             
         Returns:
-            ID de la señal en la base de datos
+            True si la señal quedó encolada para escribirse
         """
         signal = Signal(
             bot_id=bot_id,
@@ -216,18 +332,152 @@ class TradeLogger:
             was_executed=was_executed,
             execution_ticket=execution_ticket,
             skip_reason=skip_reason,
-            indicators_snapshot=json.dumps(indicators_snapshot) if indicators_snapshot else None,
+            indicators_snapshot=_dumps(indicators_snapshot) if indicators_snapshot else None,
         )
         
         # Verificar pausa global antes de guardar señal
         try:
             from utils.global_state import global_state
             if global_state.should_skip_action("log"):
-                return 0  # Saltar logging si está pausado globalmente
+                return False  # Saltar logging si está pausado globalmente
         except ImportError:
             pass  # Continuar si no está disponible global_state
         
-        return self.repository.save_signal(signal)
+        self._ensure_signal_writer()
+        if not self.repository._in_own_transaction():
+            self._signal_queue.put(signal)
+            return True
+        # Dentro de una transaction() de este hilo el escritor no puede guardar
+        # (espera a _write_lock): con la cola llena se vacía desde aquí
+        while True:
+            try:
+                self._signal_queue.put_nowait(signal)
+                return True
+            except queue.Full:
+                self._save_queued_signals()
+    
+    def flush_signals(self) -> None:
+        """
+        Espera a que el hilo escritor guarde todas las señales encoladas.
+        
+        Dentro de una transaction() del hilo actual no se espera al escritor (que
+        necesita el lock de escritura): las señales encoladas se guardan aquí.
+        """
+        if self._signal_writer is None:
+            return
+        if self.repository._in_own_transaction():
+            self._save_queued_signals()
+        else:
+            self._signal_queue.join()
+    
+    def _save_queued_signals(self) -> None:
+        """
+        Guarda desde el hilo actual las señales pendientes: el lote que el escritor
+        está completando y las que siguen en la cola, por lotes de signal_batch_size.
+        """
+        with self._signal_batch_lock:
+            batch = self._signal_batch[:]
+            self._signal_batch.clear()
+        stop = False
+        while True:
+            try:
+                item = self._signal_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP_WRITER:
+                stop = True
+                self._signal_queue.task_done()
+                continue
+            batch.append(item)
+        for start in range(0, len(batch), self.signal_batch_size):
+            self._save_signal_batch(self._signal_queue, self.repository, batch[start:start + self.signal_batch_size])
+        if stop:
+            # La señal de parada es para el hilo escritor
+            self._signal_queue.put(_STOP_WRITER)
+    
+    def _ensure_signal_writer(self) -> None:
+        """Arranca el hilo escritor de señales la primera vez que se necesita."""
+        if self._signal_writer is not None:
+            return
+        with self._signal_writer_lock:
+            if self._signal_writer is None:
+                # El hilo no referencia al logger: al recolectarlo, el finalizador
+                # encola _STOP_WRITER y el hilo termina tras guardar lo pendiente
+                writer = threading.Thread(
+                    target=self._write_signals,
+                    args=(
+                        self._signal_queue, self._signal_batch, self._signal_batch_lock,
+                        self.repository, self.signal_batch_size, self.signal_flush_seconds
+                    ),
+                    name="TradeLogger-signals",
+                    daemon=True
+                )
+                writer.start()
+                weakref.finalize(self, self._signal_queue.put, _STOP_WRITER)
+                self._signal_writer = writer
+    
+    @staticmethod
+    def _write_signals(
+        signal_queue: "queue.Queue",
+        pending: list,
+        pending_lock: threading.Lock,
+        repository: TradeRepository,
+        batch_size: int,
+        flush_seconds: float
+    ) -> None:
+        """
+        Bucle del hilo escritor: toma la primera señal disponible, completa el lote
+        hasta batch_size o flush_seconds y lo guarda en un solo commit.
+        Termina al recibir _STOP_WRITER.
+        
+        El lote se va dejando en pending (compartida con el logger) y solo se recoge
+        con el lock de escritura del repositorio tomado: si otro hilo tiene abierta
+        una transaction(), sus señales siguen en pending y ese hilo puede guardarlas
+        (ver _save_queued_signals) en lugar de quedar retenidas aquí.
+        """
+        stop = False
+        while not stop:
+            item = signal_queue.get()
+            if item is _STOP_WRITER:
+                signal_queue.task_done()
+                return
+            with pending_lock:
+                pending.append(item)
+            collected = 1
+            deadline = time.monotonic() + flush_seconds
+            while collected < batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = signal_queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP_WRITER:
+                    signal_queue.task_done()
+                    stop = True
+                    break
+                with pending_lock:
+                    pending.append(item)
+                collected += 1
+            
+            with repository._write_lock:
+                with pending_lock:
+                    batch = pending[:]
+                    pending.clear()
+                if batch:
+                    TradeLogger._save_signal_batch(signal_queue, repository, batch)
+    
+    @staticmethod
+    def _save_signal_batch(signal_queue: "queue.Queue", repository: TradeRepository, batch: list) -> None:
+        """Guarda un lote de señales tomadas de la cola y las marca como procesadas."""
+        try:
+            repository.save_signals_batch(batch)
+        except Exception as e:
+            print(f"{Utils.dateprint()} - [TradeLogger] ERROR: Could not save {len(batch)} signals: {e}")
+        finally:
+            for _ in batch:
+                signal_queue.task_done()
     
     def _calculate_profit_pips(
         self, 
@@ -237,20 +487,7 @@ class TradeLogger:
         exit_price: float
     ) -> float:
         """Calcula el profit en pips."""
-        # Determinar tamaño de pip basado en símbolo
-        if "JPY" in symbol:
-            pip_size = 0.01
-        elif "XAU" in symbol or "GOLD" in symbol:
-            pip_size = 0.1
-        else:
-            pip_size = 0.0001
-        
-        if action.lower() == "buy":
-            pips = (exit_price - entry_price) / pip_size
-        else:
-            pips = (entry_price - exit_price) / pip_size
-        
-        return round(pips, 1)
+        return profit_pips(symbol, action, entry_price, exit_price)
     
     # ==================== QUERY METHODS ====================
     
@@ -272,4 +509,5 @@ class TradeLogger:
     
     def get_recent_signals(self, bot_id: str, limit: int = 50):
         """Obtiene señales recientes de un bot."""
+        self.flush_signals()
         return self.repository.get_signals_by_bot(bot_id, limit)
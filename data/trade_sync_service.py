@@ -4,23 +4,112 @@ Trade Sync Service
 Sincroniza los trades de la base de datos con el historial de MT5.
 Se ejecuta periódicamente para mantener la DB actualizada.
 """
+import heapq
+import itertools
+import re
 import threading
 import time
 from datetime import datetime, timedelta
-from typing import Optional, List
+from operator import attrgetter
+from typing import Dict, Optional, List, Tuple
 import MetaTrader5 as mt5
 
 from data.models.trade import Trade, TradeStatus
+from data.pips import profit_pips
 from data.repositories.trade_repository import TradeRepository
 from utils.utils import Utils
 
 
+# Clave de orden de los deals de MT5 por tiempo
+_deal_time = attrgetter('time')
+
+# Marcas que MT5 pone en el comment del deal de salida al cerrar por TP/SL ("[tp 1.085]")
+_CLOSE_MARK_RE = re.compile(r'\[(tp|sl)', re.IGNORECASE)
+
+
+def _close_reason_from_comment(comment: str) -> str:
+    """close_reason ('tp', 'sl' o 'synced') según el comment del deal de salida."""
+    match = _CLOSE_MARK_RE.search(comment)
+    return match.group(1).lower() if match else 'synced'
+
+
+class _SyncScheduler:
+    """
+    Planificador compartido por todos los TradeSyncService del proceso.
+    Un único thread (creado al registrar el primer job) ejecuta los jobs periódicos
+    en orden de vencimiento, en lugar de un thread dormido por servicio.
+    """
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, int]] = []  # (vencimiento, secuencia, job_id)
+        self._jobs: Dict[int, Tuple[object, float]] = {}  # job_id -> (func, intervalo)
+        self._ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+    
+    def add_job(self, func, interval: float, delay: float = 0.0) -> int:
+        """Registra func para ejecutarse tras delay segundos y luego cada interval segundos."""
+        with self._cond:
+            job_id = next(self._ids)
+            self._jobs[job_id] = (func, interval)
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), job_id))
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name="TradeSyncScheduler")
+                self._thread.start()
+            self._cond.notify()
+        return job_id
+    
+    def remove_job(self, job_id: int):
+        """Cancela un job; su entrada pendiente en el heap se descarta al vencer."""
+        with self._cond:
+            self._jobs.pop(job_id, None)
+            self._cond.notify()
+    
+    def _run(self):
+        """Loop del thread: espera al próximo vencimiento y ejecuta el job."""
+        while True:
+            with self._cond:
+                while True:
+                    # Descartar entradas de jobs cancelados
+                    while self._heap and self._heap[0][2] not in self._jobs:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    due, _, job_id = self._heap[0]
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                
+                heapq.heappop(self._heap)
+                func, interval = self._jobs[job_id]
+            
+            try:
+                func()
+            except Exception as e:
+                print(f"{Utils.dateprint()} - [TradeSyncService] Scheduled job error: {e}")
+            
+            # La siguiente ejecución se cuenta desde el fin de esta
+            with self._cond:
+                if job_id in self._jobs:
+                    heapq.heappush(self._heap, (time.monotonic() + interval, next(self._seq), job_id))
+
+
+# Planificador único del proceso
+_scheduler = _SyncScheduler()
+
+
 class TradeSyncService:
     """
     Servicio que sincroniza trades con el historial de MT5.
     Lee el historial de la cuenta y actualiza la base de datos.
     """
     
+    # Solapamiento de cada consulta incremental con la anterior (deals tardíos)
+    SYNC_OVERLAP = timedelta(minutes=5)
+    
     # Mapeo de magic numbers a nombres de estrategia
     MAGIC_TO_STRATEGY = {
         1: 'SimpleTimeStrategy',
@@ -45,30 +134,35 @@ class TradeSyncService:
         self.sync_interval = sync_interval_minutes * 60  # Convertir a segundos
         self.history_days = history_days
         
-        self._stop_event = threading.Event()
-        self._sync_thread: Optional[threading.Thread] = None
+        self._job_id: Optional[int] = None
         self._last_sync: Optional[datetime] = None
+        # time del deal más reciente ya sincronizado: las siguientes consultas
+        # piden a MT5 solo desde ahí (None = ventana completa de history_days)
+        self._last_deal_time: Optional[int] = None
+        self.next_run_at: Optional[datetime] = None
+        
+        # Nombres derivados de magic/symbol, que se repiten en casi todos los deals:
+        # se construyen una vez y se reutilizan
+        self._strategy_names: Dict[int, str] = {}
+        self._bot_ids: Dict[Tuple[str, int], str] = {}
     
     def start(self):
         """Inicia el servicio de sincronización en background."""
-        if self._sync_thread and self._sync_thread.is_alive():
+        if self._job_id is not None:
             print(f"{Utils.dateprint()} - [TradeSyncService] Already running")
             return
         
-        self._stop_event.clear()
-        self._sync_thread = threading.Thread(
-            target=self._sync_loop,
-            daemon=True,
-            name="TradeSyncService"
-        )
-        self._sync_thread.start()
+        # Sync inicial inmediato y luego cada sync_interval, en el planificador compartido
+        self.next_run_at = datetime.now()
+        self._job_id = _scheduler.add_job(self.tick, self.sync_interval)
         print(f"{Utils.dateprint()} - [TradeSyncService] Started (sync every {self.sync_interval // 60} min)")
     
     def stop(self):
         """Detiene el servicio de sincronización."""
-        self._stop_event.set()
-        if self._sync_thread:
-            self._sync_thread.join(timeout=5)
+        if self._job_id is not None:
+            _scheduler.remove_job(self._job_id)
+            self._job_id = None
+        self.next_run_at = None
         print(f"{Utils.dateprint()} - [TradeSyncService] Stopped")
     
     def sync_now(self):
@@ -76,22 +170,18 @@ class TradeSyncService:
         print(f"{Utils.dateprint()} - [TradeSyncService] Manual sync started...")
         self._sync_with_mt5()
     
-    def _sync_loop(self):
-        """Loop principal de sincronización."""
-        # Sync inicial
+    def tick(self):
+        """Una sincronización periódica (la ejecuta el planificador compartido)."""
         self._sync_with_mt5()
-        
-        while not self._stop_event.is_set():
-            # Esperar el intervalo
-            self._stop_event.wait(self.sync_interval)
-            
-            if not self._stop_event.is_set():
-                self._sync_with_mt5()
+        if self._job_id is not None:
+            self.next_run_at = datetime.now() + timedelta(seconds=self.sync_interval)
     
     def _sync_with_mt5(self):
         """Sincroniza los trades con el historial de MT5."""
         try:
             from_date = datetime.now() - timedelta(days=self.history_days)
+            if self._last_deal_time is not None:
+                from_date = max(from_date, datetime.fromtimestamp(self._last_deal_time) - self.SYNC_OVERLAP)
             
             # Obtener historial de deals (operaciones cerradas)
             deals = mt5.history_deals_get(from_date, datetime.now())
@@ -100,84 +190,139 @@ class TradeSyncService:
                 print(f"{Utils.dateprint()} - [TradeSyncService] No deals found in history")
                 return
             
-            # Procesar deals
-            synced_count = 0
-            updated_count = 0
+            # Procesar deals: se acumulan los trades nuevos y actualizados y se
+            # escriben al final
+            new_trades: List[Trade] = []
+            updated_trades: List[Trade] = []
             
             # Agrupar deals por position_id para obtener trades completos
             positions = self._group_deals_by_position(deals)
+            self._complete_positions(positions)
+            
+            # Trades ya guardados de estas posiciones, con una consulta por lote de
+            # tickets en lugar de una por posición
+            existing_trades = self.repository.get_trades_by_tickets(
+                self._position_ticket(position_id, position_deals)
+                for position_id, position_deals in positions.items()
+            )
             
             for position_id, position_deals in positions.items():
-                result = self._process_position(position_id, position_deals)
+                result, trade = self._process_position(position_id, position_deals, existing_trades)
                 if result == 'new':
-                    synced_count += 1
+                    new_trades.append(trade)
                 elif result == 'updated':
-                    updated_count += 1
+                    updated_trades.append(trade)
+            
+            # Una sola transacción (un único commit) para toda la sincronización;
+            # si falla no se aplica ningún cambio
+            if new_trades or updated_trades:
+                with self.repository.transaction():
+                    self.repository.save_trades_batch(new_trades)
+                    self.repository.update_trades_batch(updated_trades)
             
             self._last_sync = datetime.now()
-            print(f"{Utils.dateprint()} - [TradeSyncService] Sync complete: {synced_count} new, {updated_count} updated")
+            if deals:
+                self._last_deal_time = max(map(_deal_time, deals))
+            print(f"{Utils.dateprint()} - [TradeSyncService] Sync complete: {len(new_trades)} new, {len(updated_trades)} updated")
             
         except Exception as e:
             print(f"{Utils.dateprint()} - [TradeSyncService] ERROR: {e}")
     
     def _group_deals_by_position(self, deals) -> dict:
-        """Agrupa deals por position_id."""
+        """
+        Agrupa deals por position_id, cada grupo ordenado por tiempo.
+        
+        Los deals se agrupan tal cual (registros de MT5, sin convertir a dict):
+        el resto del servicio lee sus campos como atributos.
+        """
         positions = {}
         
         for deal in deals:
-            deal_dict = deal._asdict()
-            pos_id = deal_dict.get('position_id', 0)
+            pos_id = deal.position_id
             
             if pos_id == 0:
                 continue
-                
-            if pos_id not in positions:
-                positions[pos_id] = []
-            positions[pos_id].append(deal_dict)
+            
+            position_deals = positions.get(pos_id)
+            if position_deals is None:
+                positions[pos_id] = [deal]
+            else:
+                position_deals.append(deal)
+        
+        # Ordenar deals por tiempo para determinar entrada/salida correctamente
+        # El primer deal (más antiguo) es la entrada, el último es la salida
+        for position_deals in positions.values():
+            if len(position_deals) > 1:
+                position_deals.sort(key=_deal_time)
         
         return positions
     
-    def _process_position(self, position_id: int, deals: List[dict]) -> str:
+    @staticmethod
+    def _complete_positions(positions: dict):
+        """
+        Completa las posiciones cuyo deal de entrada quedó fuera de la consulta
+        (abiertas antes de from_date) con todos sus deals, pedidos a MT5 por posición.
+        Sin el deal de entrada, el de salida se tomaría como entrada de un trade nuevo.
+        """
+        for position_id, position_deals in positions.items():
+            if position_deals[0].entry == mt5.DEAL_ENTRY_IN:
+                continue
+            
+            all_deals = mt5.history_deals_get(position=position_id)
+            if all_deals:
+                positions[position_id] = sorted(all_deals, key=_deal_time)
+    
+    @staticmethod
+    def _position_ticket(position_id: int, deals: list) -> int:
+        """Ticket del trade de una posición: order del deal de entrada (o position_id)."""
+        return getattr(deals[0], 'order', position_id)
+    
+    def _process_position(
+        self,
+        position_id: int,
+        deals: list,
+        existing_trades: Dict[int, Trade]
+    ) -> Tuple[str, Optional[Trade]]:
         """
-        Procesa una posición y sus deals.
+        Procesa una posición y sus deals (sin escribir en la base de datos).
+        
+        Args:
+            position_id: ID de la posición en MT5
+            deals: Deals de MT5 de la posición ordenados por tiempo
+            existing_trades: Trades ya guardados, por ticket (get_trades_by_tickets)
         
         Returns:
-            'new' si se creó nuevo, 'updated' si se actualizó, 'skip' si no hubo cambios
+            ('new', trade) si hay que crearlo, ('updated', trade) si hay que
+            actualizarlo, ('skip', None) si no hubo cambios
         """
         if not deals:
-            return 'skip'
-        
-        # Ordenar deals por tiempo para determinar entrada/salida correctamente
-        # El primer deal (más antiguo) es la entrada, el último es la salida
-        sorted_deals = sorted(deals, key=lambda d: d.get('time', 0))
-        
-        entry_deal = sorted_deals[0]  # Primer deal = entrada
-        exit_deal = sorted_deals[-1] if len(sorted_deals) > 1 else None  # Último deal = salida
+            return 'skip', None
         
-        # Si solo hay un deal, es una posición abierta
-        if len(sorted_deals) == 1:
-            exit_deal = None
+        entry_deal = deals[0]  # Primer deal = entrada
+        exit_deal = deals[-1] if len(deals) > 1 else None  # Último deal = salida
         
         # Obtener ticket del deal de entrada (usar order o position_id)
-        ticket = entry_deal.get('order', position_id)
+        ticket = self._position_ticket(position_id, deals)
         
         # Verificar si ya existe en la base de datos
-        existing_trade = self.repository.get_trade_by_ticket(ticket)
+        existing_trade = existing_trades.get(ticket)
         
         if existing_trade:
             # Si existe y está abierto pero hay deal de salida, actualizar
             if existing_trade.status == TradeStatus.OPENED and exit_deal:
-                return self._update_trade_from_exit(existing_trade, exit_deal)
-            return 'skip'
+                trade = self._update_trade_from_exit(existing_trade, exit_deal)
+                return ('updated', trade) if trade else ('skip', None)
+            return 'skip', None
         else:
             # Crear nuevo trade
-            return self._create_trade_from_deals(entry_deal, exit_deal)
+            trade = self._create_trade_from_deals(entry_deal, exit_deal)
+            return ('new', trade) if trade else ('skip', None)
     
-    def _create_trade_from_deals(self, entry_deal: dict, exit_deal: dict = None) -> str:
-        """Crea un nuevo trade desde los deals de MT5."""
+    def _create_trade_from_deals(self, entry_deal, exit_deal=None) -> Optional[Trade]:
+        """Crea un nuevo trade desde los deals de MT5 (None si los deals no son válidos)."""
         try:
             # Determinar action
-            deal_type = entry_deal.get('type', 0)
+            deal_type = entry_deal.type
             action = 'buy' if deal_type == 0 else 'sell'  # 0=BUY, 1=SELL
             
             # Determinar status
@@ -189,125 +334,101 @@ class TradeSyncService:
             closed_at = None
             
             if exit_deal:
-                profit = exit_deal.get('profit', 0.0)
-                exit_price = exit_deal.get('price', 0.0)
-                exit_time = exit_deal.get('time', 0)
+                profit = exit_deal.profit
+                exit_price = exit_deal.price
+                exit_time = exit_deal.time
                 if exit_time:
                     closed_at = datetime.fromtimestamp(exit_time)
             
             # Obtener nombre de estrategia desde magic number
-            magic = entry_deal.get('magic', 0)
-            strategy_name = self.MAGIC_TO_STRATEGY.get(magic, f'Unknown_M{magic}')
+            magic = entry_deal.magic
+            strategy_name = self._strategy_names.get(magic)
+            if strategy_name is None:
+                strategy_name = self._strategy_names[magic] = self.MAGIC_TO_STRATEGY.get(magic, f'Unknown_M{magic}')
             
             # Detectar close_reason desde el comment del deal de salida
             close_reason = None
             if exit_deal:
-                exit_comment = exit_deal.get('comment', '').lower()
-                if '[tp' in exit_comment:
-                    close_reason = 'tp'
-                elif '[sl' in exit_comment:
-                    close_reason = 'sl'
-                else:
-                    close_reason = 'synced'
+                close_reason = _close_reason_from_comment(exit_deal.comment)
             
             # Crear trade
             trade = Trade(
-                ticket=entry_deal.get('order', entry_deal.get('position_id')),
+                ticket=getattr(entry_deal, 'order', entry_deal.position_id),
                 magic_number=magic,
                 bot_id=self._get_bot_id_from_deal(entry_deal),
                 strategy_name=strategy_name,
-                symbol=entry_deal.get('symbol', ''),
+                symbol=entry_deal.symbol,
                 action=action,
-                volume=entry_deal.get('volume', 0.0),
-                entry_price=entry_deal.get('price', 0.0),
+                volume=entry_deal.volume,
+                entry_price=entry_deal.price,
                 exit_price=exit_price,
                 sl_price=None,  # No disponible en historial
                 tp_price=None,  # No disponible en historial
                 profit=profit,
                 profit_pips=self._calculate_pips(
-                    entry_deal.get('symbol', ''),
+                    entry_deal.symbol,
                     action,
-                    entry_deal.get('price', 0.0),
+                    entry_deal.price,
                     exit_price or 0.0
                 ) if exit_price else None,
-                commission=entry_deal.get('commission', 0.0) + (exit_deal.get('commission', 0.0) if exit_deal else 0.0),
-                swap=entry_deal.get('swap', 0.0) + (exit_deal.get('swap', 0.0) if exit_deal else 0.0),
-                opened_at=datetime.fromtimestamp(entry_deal.get('time', 0)),
+                commission=entry_deal.commission + (exit_deal.commission if exit_deal else 0.0),
+                swap=entry_deal.swap + (exit_deal.swap if exit_deal else 0.0),
+                opened_at=datetime.fromtimestamp(entry_deal.time),
                 closed_at=closed_at,
                 status=status,
                 close_reason=close_reason,
             )
             
-            self.repository.save_trade(trade)
-            return 'new'
+            return trade
             
         except Exception as e:
             print(f"{Utils.dateprint()} - [TradeSyncService] Error creating trade: {e}")
-            return 'skip'
+            return None
     
-    def _update_trade_from_exit(self, trade: Trade, exit_deal: dict) -> str:
-        """Actualiza un trade existente con datos de cierre."""
+    def _update_trade_from_exit(self, trade: Trade, exit_deal) -> Optional[Trade]:
+        """Completa un trade existente con los datos de cierre (None si el deal no es válido)."""
         try:
-            trade.exit_price = exit_deal.get('price', 0.0)
-            trade.profit = exit_deal.get('profit', 0.0)
+            trade.exit_price = exit_deal.price
+            trade.profit = exit_deal.profit
             trade.profit_pips = self._calculate_pips(
                 trade.symbol,
                 trade.action,
                 trade.entry_price,
                 trade.exit_price
             )
-            trade.commission = (trade.commission or 0) + exit_deal.get('commission', 0.0)
-            trade.swap = (trade.swap or 0) + exit_deal.get('swap', 0.0)
-            trade.closed_at = datetime.fromtimestamp(exit_deal.get('time', 0))
+            trade.commission = (trade.commission or 0) + exit_deal.commission
+            trade.swap = (trade.swap or 0) + exit_deal.swap
+            trade.closed_at = datetime.fromtimestamp(exit_deal.time)
             trade.status = TradeStatus.CLOSED
             
             # Detectar close_reason desde el comment
-            exit_comment = exit_deal.get('comment', '').lower()
-            if '[tp' in exit_comment:
-                trade.close_reason = 'tp'
-            elif '[sl' in exit_comment:
-                trade.close_reason = 'sl'
-            else:
-                trade.close_reason = 'synced'
+            trade.close_reason = _close_reason_from_comment(exit_deal.comment)
             
-            self.repository.update_trade(trade)
-            return 'updated'
+            return trade
             
         except Exception as e:
             print(f"{Utils.dateprint()} - [TradeSyncService] Error updating trade: {e}")
-            return 'skip'
+            return None
     
-    def _get_bot_id_from_deal(self, deal: dict) -> str:
+    def _get_bot_id_from_deal(self, deal) -> str:
         """Intenta determinar el bot_id desde el deal."""
-        magic = deal.get('magic', 0)
-        symbol = deal.get('symbol', 'UNKNOWN')
-        comment = deal.get('comment', '')
-        
-        # Intentar extraer del comment o crear uno genérico
-        if comment and 'FWK' in comment:
-            return f"Synced_{symbol}_M{magic}"
+        magic = deal.magic
+        symbol = deal.symbol
         
-        return f"Synced_{symbol}_M{magic}"
+        # El comment (p. ej. 'FWK ...') aún no identifica al bot: se usa uno
+        # genérico por símbolo y magic
+        key = (symbol, magic)
+        bot_id = self._bot_ids.get(key)
+        if bot_id is None:
+            bot_id = self._bot_ids[key] = f"Synced_{symbol}_M{magic}"
+        return bot_id
     
     def _calculate_pips(self, symbol: str, action: str, entry: float, exit: float) -> float:
         """Calcula pips de profit."""
         if not entry or not exit:
             return 0.0
         
-        # Determinar tamaño de pip
-        if "JPY" in symbol:
-            pip_size = 0.01
-        elif "XAU" in symbol or "GOLD" in symbol:
-            pip_size = 0.1
-        else:
-            pip_size = 0.0001
-        
-        if action.lower() == "buy":
-            pips = (exit - entry) / pip_size
-        else:
-            pips = (entry - exit) / pip_size
-        
-        return round(pips, 1)
+        return profit_pips(symbol, action, entry, exit)
     
     def get_last_sync_time(self) -> Optional[datetime]:
         """Retorna el tiempo de la última sincronización."""
@@ -13,6 +13,7 @@ from .interfaces.data_provider_interface import (
     MarketData
 )
 from .oanda_provider import OandaProvider
+from .oanda_provider_async import OandaProviderAsync
 from .provider_manager import DataProviderManager, ProviderPriority, create_default_manager
 
 __all__ = [
@@ -21,6 +22,7 @@ __all__ = [
     "TimeFrame",
     "MarketData",
     "OandaProvider",
+    "OandaProviderAsync",
     "DataProviderManager",
     "ProviderPriority",
     "create_default_manager"
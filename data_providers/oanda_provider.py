@@ -5,17 +5,63 @@ Requiere cuenta Oanda y API token.
 Documentación: https://developer.oanda.com/rest-live-v20/introduction/
 """
 import requests
+import numpy as np
 import pandas as pd
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import time
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 from .interfaces.data_provider_interface import IDataProvider, DataProviderType, TimeFrame, MarketData
 from utils.utils import Utils
 
 
+# Formato de los tiempos de las velas (RFC3339, UTC)
+_OANDA_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+
+class _TokenBucket:
+    """
+    Rate limiter token bucket: permite ráfagas de hasta capacity requests y
+    repone rate tokens por segundo. Seguro entre threads.
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def reserve(self, tokens: int = 1) -> float:
+        """Consume tokens y devuelve los segundos a esperar antes de usarlos (0 si hay)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Se reserva el token aunque quede en negativo: cada thread espera
+            # solo su turno y los siguientes se encolan detrás
+            self._tokens -= tokens
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+    
+    def acquire(self, tokens: int = 1):
+        """Consume tokens; si el bucket está vacío espera (fuera del lock) a que se repongan."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
 class OandaProvider(IDataProvider):
     """Proveedor de datos para Oanda API v20."""
     
@@ -32,6 +78,24 @@ class OandaProvider(IDataProvider):
         TimeFrame.MN1: "M"
     }
     
+    # Mapeo de símbolos especiales
+    SPECIAL_SYMBOLS = {
+        "XAUUSD": "XAU_USD",
+        "XAGUSD": "XAG_USD",
+        "US30": "US30_USD",
+        "SPX500": "SPX500_USD",
+        "NAS100": "NAS100_USD",
+        "DE30": "DE30_EUR",
+        "UK100": "UK100_GBP",
+        "JP225": "JP225_USD"
+    }
+    
+    # Segundos durante los que un precio obtenido confirma que el mercado está abierto
+    _MARKET_OPEN_TTL = 30.0
+    
+    # Segundos que se reutiliza un spread (cambia mucho más lento que el precio)
+    _SPREAD_TTL = 60.0
+    
     def __init__(self, account_id: Optional[str] = None, api_token: Optional[str] = None):
         """
         Inicializa el proveedor Oanda.
@@ -54,21 +118,42 @@ class OandaProvider(IDataProvider):
             self.api_url = "https://api-fxpractice.oanda.com"
             self.stream_url = "https://stream-fxpractice.oanda.com"
         
-        self.headers = {
+        # Sesión HTTP persistente: keep-alive y pool de conexiones, sin handshake
+        # TCP+TLS por request. Reintenta errores transitorios (429/5xx) con backoff.
+        # Los headers se fijan una vez en la sesión, no en cada request
+        self._session = requests.Session()
+        self._session.headers.update({
             "Authorization": f"Bearer {self.api_token}",
-            "Content-Type": "application/json"
-        }
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip"
+        })
+        retries = Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            raise_on_status=False  # La última respuesta pasa por raise_for_status
+        )
+        self._session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries))
         
         self._connected = False
-        self._last_request_time = 0
-        self._rate_limit_delay = 0.1  # 100ms entre requests
+        # Símbolo estándar -> símbolo Oanda (acotado por los símbolos usados)
+        self._oanda_symbols: Dict[str, str] = dict(self.SPECIAL_SYMBOLS)
+        # Último precio obtenido por símbolo (monotonic), para is_market_open
+        self._last_price_at: Dict[str, float] = {}
+        # Spreads por instrumento: oanda_symbol -> (spread, expiración monotonic)
+        self._spread_cache: Dict[str, Tuple[float, float]] = {}
+        
+        # 10 requests/s de media (100ms entre requests) con ráfagas de hasta 20
+        self._bucket = _TokenBucket(rate=10.0, capacity=20)
+    
+    @property
+    def headers(self):
+        """Headers enviados en cada request (los de la sesión HTTP)."""
+        return self._session.headers
     
     def _rate_limit(self):
-        """Implementa rate limiting simple."""
-        elapsed = time.time() - self._last_request_time
-        if elapsed < self._rate_limit_delay:
-            time.sleep(self._rate_limit_delay - elapsed)
-        self._last_request_time = time.time()
+        """Rate limiting compartido por todos los threads del proveedor."""
+        self._bucket.acquire(1)
     
     def _make_request(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
         """Hace request con rate limiting y manejo de errores."""
@@ -76,10 +161,13 @@ class OandaProvider(IDataProvider):
         
         try:
             url = f"{self.api_url}/{endpoint}"
-            response = requests.get(url, headers=self.headers, params=params, timeout=10)
+            response = self._session.get(url, params=params, timeout=10)
             response.raise_for_status()
+            # orjson decodifica las respuestas de velas (hasta 5000) bastante más rápido
+            if ORJSON_AVAILABLE:
+                return orjson.loads(response.content)
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             print(f"{Utils.dateprint()} - [Oanda] API error: {e}")
             return None
     
@@ -102,6 +190,7 @@ class OandaProvider(IDataProvider):
     def disconnect(self) -> bool:
         """Desconecta de Oanda."""
         self._connected = False
+        self._session.close()
         print(f"{Utils.dateprint()} - [Oanda] Desconectado")
         return True
     
@@ -122,6 +211,19 @@ class OandaProvider(IDataProvider):
             print(f"{Utils.dateprint()} - [Oanda] No conectado")
             return None
         
+        endpoint, params = self._candles_request(symbol, timeframe, count, start_time, end_time)
+        result = self._make_request(endpoint, params)
+        return self._parse_candles(symbol, timeframe, result)
+    
+    def _candles_request(
+        self,
+        symbol: str,
+        timeframe: TimeFrame,
+        count: int,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime]
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Endpoint y parámetros de la request de velas históricas."""
         # Convertir símbolo a formato Oanda (ej: EURUSD -> EUR_USD)
         oanda_symbol = self._convert_symbol_to_oanda(symbol)
         oanda_timeframe = self.TIMEFRAME_MAP.get(timeframe, "H1")
@@ -138,34 +240,57 @@ class OandaProvider(IDataProvider):
             params["to"] = end_time.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
         
         print(f"{Utils.dateprint()} - [Oanda] Solicitando datos: {symbol} {timeframe.value} x{count}")
-        
-        result = self._make_request(f"v3/instruments/{oanda_symbol}/candles", params)
-        
+        return f"v3/instruments/{oanda_symbol}/candles", params
+    
+    def _parse_candles(self, symbol: str, timeframe: TimeFrame, result: Optional[Dict]) -> Optional[MarketData]:
+        """Convierte la respuesta de velas de Oanda en MarketData (None si no hay velas completas)."""
         if not result or "candles" not in result:
             print(f"{Utils.dateprint()} - [Oanda] No se obtuvieron datos para {symbol}")
             return None
         
-        # Convertir a DataFrame
-        candles = []
-        for candle in result["candles"]:
-            if candle.get("complete", True):  # Solo velas completas
+        # Convertir a DataFrame por columnas (arrays con dtype fijo, sin un dict por vela)
+        candles = result["candles"]
+        n = len(candles)
+        times = np.empty(n, dtype=object)
+        opens = np.empty(n, dtype=np.float64)
+        highs = np.empty(n, dtype=np.float64)
+        lows = np.empty(n, dtype=np.float64)
+        closes = np.empty(n, dtype=np.float64)
+        volumes = np.empty(n, dtype=np.int64)
+        complete = np.empty(n, dtype=bool)
+        
+        for i, candle in enumerate(candles):
+            complete[i] = candle.get("complete", True)  # Solo velas completas
+            if complete[i]:
                 mid = candle["mid"]
-                candles.append({
-                    "time": pd.to_datetime(candle["time"]),
-                    "Open": float(mid["o"]),
-                    "High": float(mid["h"]),
-                    "Low": float(mid["l"]),
-                    "Close": float(mid["c"]),
-                    "Volume": int(candle["volume"])
-                })
-        
-        if not candles:
+                times[i] = candle["time"]
+                opens[i] = float(mid["o"])
+                highs[i] = float(mid["h"])
+                lows[i] = float(mid["l"])
+                closes[i] = float(mid["c"])
+                volumes[i] = int(candle["volume"])
+        
+        if not complete.any():
             print(f"{Utils.dateprint()} - [Oanda] Sin velas completas para {symbol}")
             return None
         
-        df = pd.DataFrame(candles)
-        df.set_index("time", inplace=True)
-        df.sort_index(inplace=True)
+        df = pd.DataFrame(
+            {
+                "Open": opens[complete],
+                "High": highs[complete],
+                "Low": lows[complete],
+                "Close": closes[complete],
+                "Volume": volumes[complete],
+            },
+            # Oanda devuelve RFC3339 en UTC ("2024-01-01T00:00:00.000000000Z"): con el
+            # formato explícito pandas usa su parser vectorizado sin inferir por fila
+            index=pd.DatetimeIndex(
+                pd.to_datetime(times[complete], format=_OANDA_TIME_FORMAT, utc=True), name="time"
+            )
+        )
+        # Oanda devuelve las velas en orden ascendente: solo se ordena si no lo están
+        if not df.index.is_monotonic_increasing:
+            df.sort_index(inplace=True)
         
         print(f"{Utils.dateprint()} - [Oanda] ✅ Obtenidas {len(df)} velas de {symbol}")
         
@@ -177,6 +302,32 @@ class OandaProvider(IDataProvider):
             last_update=datetime.now()
         )
     
+    def get_historical_data_batch(
+        self,
+        symbols: List[str],
+        timeframe: TimeFrame,
+        count: int = 100,
+        max_workers: int = 8
+    ) -> Dict[str, Optional[MarketData]]:
+        """
+        Obtiene datos históricos de varios símbolos en paralelo.
+        
+        Cada request espera sobre todo a la red (el GIL se libera durante el I/O),
+        así que N símbolos tardan cerca de la request más lenta en lugar de la suma.
+        
+        Returns:
+            Dict símbolo -> MarketData (None si no se obtuvieron datos)
+        """
+        if not symbols:
+            return {}
+        
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(symbols)), thread_name_prefix="OandaFetch") as executor:
+            futures = {
+                symbol: executor.submit(self.get_historical_data, symbol, timeframe, count)
+                for symbol in symbols
+            }
+            return {symbol: future.result() for symbol, future in futures.items()}
+    
     def get_current_price(self, symbol: str) -> Optional[Dict[str, float]]:
         """Obtiene precio actual de Oanda."""
         if not self._connected:
@@ -185,7 +336,8 @@ class OandaProvider(IDataProvider):
         oanda_symbol = self._convert_symbol_to_oanda(symbol)
         result = self._make_request(f"v3/instruments/{oanda_symbol}/candles", {
             "count": 1,
-            "granularity": "S5"  # 5 segundos para precio más reciente
+            "granularity": "S5",  # 5 segundos para precio más reciente
+            "price": "MBA"  # Mid, bid y ask en la misma respuesta
         })
         
         if not result or not result.get("candles"):
@@ -195,8 +347,16 @@ class OandaProvider(IDataProvider):
         if "mid" in candle:
             mid = candle["mid"]
             price = float(mid["c"])
+            self._last_price_at[symbol] = time.monotonic()
+            
+            if "bid" in candle and "ask" in candle:
+                return {
+                    "bid": float(candle["bid"]["c"]),
+                    "ask": float(candle["ask"]["c"]),
+                    "price": price
+                }
             
-            # Obtener spread aproximado
+            # Sin bid/ask en la respuesta: spread aproximado
             spread = self._get_spread(oanda_symbol)
             half_spread = spread / 2
             
@@ -209,7 +369,17 @@ class OandaProvider(IDataProvider):
         return None
     
     def _get_spread(self, oanda_symbol: str) -> float:
-        """Obtiene spread aproximado del instrumento."""
+        """Obtiene spread aproximado del instrumento (cacheado _SPREAD_TTL segundos)."""
+        entry = self._spread_cache.get(oanda_symbol)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        
+        spread = self._fetch_spread(oanda_symbol)
+        self._spread_cache[oanda_symbol] = (spread, time.monotonic() + self._SPREAD_TTL)
+        return spread
+    
+    def _fetch_spread(self, oanda_symbol: str) -> float:
+        """Consulta a Oanda el spread del instrumento (o un valor por defecto)."""
         try:
             result = self._make_request(f"v3/instruments/{oanda_symbol}/candles", {
                 "count": 1,
@@ -283,10 +453,34 @@ class OandaProvider(IDataProvider):
         
         Nota: Oanda no proporciona esta info directamente,
         así que verificamos si podemos obtener precio actual.
+        Antes de consultar: un precio obtenido hace menos de _MARKET_OPEN_TTL
+        segundos implica abierto, y el fin de semana (UTC) implica cerrado.
         """
+        last_price_at = self._last_price_at.get(symbol)
+        if last_price_at is not None and time.monotonic() - last_price_at < self._MARKET_OPEN_TTL:
+            return True
+        
+        if self._is_weekend_closed(datetime.now(timezone.utc)):
+            return False
+        
         price = self.get_current_price(symbol)
         return price is not None
     
+    @staticmethod
+    def _is_weekend_closed(now: datetime) -> bool:
+        """
+        True en el cierre semanal de forex/CFDs de Oanda: de viernes 22:00 a
+        domingo 21:00 UTC (márgenes conservadores; fuera de ellos se consulta).
+        """
+        weekday = now.weekday()
+        if weekday == 5:  # Sábado
+            return True
+        if weekday == 4:  # Viernes
+            return now.hour >= 22
+        if weekday == 6:  # Domingo
+            return now.hour < 21
+        return False
+    
     @property
     def provider_type(self) -> DataProviderType:
         """Tipo de proveedor."""
@@ -301,27 +495,20 @@ class OandaProvider(IDataProvider):
         GBPUSD -> GBP_USD
         XAUUSD -> XAU_USD
         """
-        # Mapeo de símbolos especiales
-        special_symbols = {
-            "XAUUSD": "XAU_USD",
-            "XAGUSD": "XAG_USD",
-            "US30": "US30_USD",
-            "SPX500": "SPX500_USD",
-            "NAS100": "NAS100_USD",
-            "DE30": "DE30_EUR",
-            "UK100": "UK100_GBP",
-            "JP225": "JP225_USD"
-        }
-        
-        if symbol in special_symbols:
-            return special_symbols[symbol]
+        # Conversiones ya hechas (incluye los símbolos especiales)
+        oanda_symbol = self._oanda_symbols.get(symbol)
+        if oanda_symbol is not None:
+            return oanda_symbol
         
         # Para pares de forex estándar de 6 caracteres
         if len(symbol) == 6 and symbol.isalpha():
-            return f"{symbol[:3]}_{symbol[3:]}"
+            oanda_symbol = f"{symbol[:3]}_{symbol[3:]}"
+        else:
+            # Fallback: devolver tal como está
+            oanda_symbol = symbol
         
-        # Fallback: devolver tal como está
-        return symbol
+        self._oanda_symbols[symbol] = oanda_symbol
+        return oanda_symbol
     
     def test_connection(self) -> Dict[str, Any]:
         """
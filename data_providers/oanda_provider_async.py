@@ -0,0 +1,186 @@
+"""
+Oanda Data Provider asíncrono (aiohttp)
+
+Variante de OandaProvider para cargas con muchos símbolos/timeframes: las
+requests de velas se lanzan concurrentemente con asyncio.gather desde un solo
+thread, en lugar de un thread bloqueado por request.
+
+Requiere aiohttp (opcional): pip install aiohttp
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, List, Optional
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+from .interfaces.data_provider_interface import TimeFrame, MarketData
+from .oanda_provider import OandaProvider, ORJSON_AVAILABLE
+from utils.utils import Utils
+
+if ORJSON_AVAILABLE:
+    import orjson
+
+
+class OandaProviderAsync(OandaProvider):
+    """
+    OandaProvider con métodos async para descargas concurrentes.
+    
+    Conexión, símbolos y parseo de velas son los de OandaProvider; el rate
+    limiting (token bucket) es el mismo, pero la espera no bloquea el event loop.
+    
+    La ClientSession pertenece al event loop en que se creó: si se usa desde
+    otro loop (p. ej. varios asyncio.run()) se crea una nueva. Para cerrar las
+    conexiones al terminar cada loop, usar ``async with provider:`` o aclose().
+    """
+    
+    # Reintentos equivalentes al Retry(total=3, backoff_factor=0.3) de la sesión síncrona
+    RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+    MAX_RETRIES = 3
+    BACKOFF_FACTOR = 0.3
+    
+    def __init__(self, account_id: Optional[str] = None, api_token: Optional[str] = None):
+        if not AIOHTTP_AVAILABLE:
+            raise ImportError("OandaProviderAsync requiere aiohttp: pip install aiohttp")
+        super().__init__(account_id=account_id, api_token=api_token)
+        # La ClientSession se crea dentro del event loop en la primera request y
+        # queda ligada a ese loop (cada asyncio.run() crea uno nuevo)
+        self._async_session: Optional["aiohttp.ClientSession"] = None
+        self._async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+    
+    async def _get_async_session(self) -> "aiohttp.ClientSession":
+        """
+        Devuelve la ClientSession del event loop actual (keep-alive, hasta 16
+        conexiones), creándola si no existe o si pertenece a otro loop.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._async_session
+        if session is not None and not session.closed and self._async_session_loop is loop:
+            return session
+        
+        if session is not None and not session.closed:
+            self._discard_session(session, self._async_session_loop)
+        self._async_session = aiohttp.ClientSession(
+            headers=self.headers,
+            connector=aiohttp.TCPConnector(limit=16),
+            timeout=aiohttp.ClientTimeout(total=10)
+        )
+        self._async_session_loop = loop
+        return self._async_session
+    
+    @staticmethod
+    def _discard_session(session: "aiohttp.ClientSession", loop: Optional[asyncio.AbstractEventLoop]):
+        """
+        Descarta una sesión de otro event loop. Si ese loop sigue corriendo (otro
+        thread) se cierra en él; si ya terminó no puede cerrarse desde aquí y sus
+        sockets quedan para el recolector (por eso conviene aclose() por loop).
+        """
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        else:
+            session.detach()
+    
+    def _retry_delay(self, retry: int, retry_after: Optional[str] = None) -> float:
+        """
+        Espera antes del reintento número retry (1..MAX_RETRIES), como urllib3:
+        sin espera el primero, luego BACKOFF_FACTOR * 2^(retry-1). Respeta
+        Retry-After (en segundos) si el servidor lo envía.
+        """
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return 0.0 if retry <= 1 else self.BACKOFF_FACTOR * (2 ** (retry - 1))
+    
+    async def _make_request_async(self, endpoint: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        Versión async de _make_request (mismo rate limiting, reintentos y manejo
+        de errores): 429/5xx y errores de conexión se reintentan con backoff.
+        """
+        wait = self._bucket.reserve(1)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        
+        url = f"{self.api_url}/{endpoint}"
+        for retry in range(self.MAX_RETRIES + 1):
+            try:
+                session = await self._get_async_session()
+                async with session.get(url, params=params) as response:
+                    if response.status in self.RETRY_STATUS and retry < self.MAX_RETRIES:
+                        delay = self._retry_delay(retry + 1, response.headers.get("Retry-After"))
+                    else:
+                        response.raise_for_status()
+                        body = await response.read()
+                        return orjson.loads(body) if ORJSON_AVAILABLE else json.loads(body)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if retry == self.MAX_RETRIES:
+                    print(f"{Utils.dateprint()} - [Oanda] API error: {e}")
+                    return None
+                delay = self._retry_delay(retry + 1)
+            except (aiohttp.ClientError, ValueError) as e:
+                print(f"{Utils.dateprint()} - [Oanda] API error: {e}")
+                return None
+            await asyncio.sleep(delay)
+        return None
+    
+    async def get_historical_data_async(
+        self,
+        symbol: str,
+        timeframe: TimeFrame,
+        count: int = 100,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None
+    ) -> Optional[MarketData]:
+        """Versión async de get_historical_data."""
+        if not self._connected:
+            print(f"{Utils.dateprint()} - [Oanda] No conectado")
+            return None
+        
+        endpoint, params = self._candles_request(symbol, timeframe, count, start_time, end_time)
+        result = await self._make_request_async(endpoint, params)
+        return self._parse_candles(symbol, timeframe, result)
+    
+    async def get_many(
+        self,
+        symbols: List[str],
+        timeframe: TimeFrame,
+        count: int = 100,
+        max_concurrency: int = 8
+    ) -> Dict[str, Optional[MarketData]]:
+        """
+        Obtiene datos históricos de varios símbolos concurrentemente.
+        
+        Returns:
+            Dict símbolo -> MarketData (None si no se obtuvieron datos)
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def fetch(symbol: str) -> Optional[MarketData]:
+            async with semaphore:
+                return await self.get_historical_data_async(symbol, timeframe, count)
+        
+        results = await asyncio.gather(*(fetch(symbol) for symbol in symbols))
+        return dict(zip(symbols, results))
+    
+    async def aclose(self):
+        """Cierra la ClientSession async (llamar desde el loop que la usó)."""
+        session = self._async_session
+        if session is not None and not session.closed:
+            if self._async_session_loop is asyncio.get_running_loop():
+                await session.close()
+            else:
+                self._discard_session(session, self._async_session_loop)
+        self._async_session = None
+        self._async_session_loop = None
+    
+    async def __aenter__(self) -> "OandaProviderAsync":
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
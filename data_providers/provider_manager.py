@@ -3,15 +3,51 @@ Data Provider Manager - Gestor centralizado de proveedores de datos
 
 Permite cambiar automáticamente entre proveedores según disponibilidad.
 """
-from typing import Dict, List, Optional, Any
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime
 from enum import Enum
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pandas as pd
 
 from .interfaces.data_provider_interface import IDataProvider, DataProviderType, TimeFrame, MarketData
 from .oanda_provider import OandaProvider
 from utils.utils import Utils
 
 
+# Duración de cada vela en segundos (MN1 es variable: solo aplica el TTL)
+_TIMEFRAME_SECONDS = {
+    TimeFrame.M1: 60,
+    TimeFrame.M5: 300,
+    TimeFrame.M15: 900,
+    TimeFrame.M30: 1800,
+    TimeFrame.H1: 3600,
+    TimeFrame.H4: 14400,
+    TimeFrame.D1: 86400,
+    TimeFrame.W1: 604800,
+}
+
+
+@dataclass
+class _Breaker:
+    """
+    Circuit breaker de un proveedor: tras failure_threshold fallos consecutivos
+    (en window_s segundos) se abre y el proveedor se omite durante recovery_s;
+    luego pasa a half_open y la siguiente llamada decide si se cierra o se reabre.
+    """
+    state: str = "closed"  # 'closed', 'open' o 'half_open'
+    fail_count: int = 0
+    first_failure_at: float = 0.0
+    opened_at: float = 0.0
+    failure_threshold: int = 3
+    window_s: float = 60.0
+    recovery_s: float = 30.0
+
+
 class ProviderPriority(Enum):
     """Prioridades de proveedores."""
     PRIMARY = 1
@@ -22,10 +58,39 @@ class ProviderPriority(Enum):
 class DataProviderManager:
     """Gestor que maneja múltiples proveedores de datos con failover automático."""
     
-    def __init__(self):
+    # Ventaja (segundos) de cada proveedor de respaldo sobre el siguiente en prioridad
+    _FALLBACK_STAGGER = 0.05
+    
+    def __init__(
+        self,
+        historical_cache_ttl: float = 30.0,
+        price_cache_ttl: float = 0.5,
+        historical_cache_size: int = 64,
+        price_cache_size: int = 256
+    ):
+        """
+        Args:
+            historical_cache_ttl: Segundos que se reutiliza una respuesta de datos históricos
+            price_cache_ttl: Segundos que se reutiliza un precio actual
+            historical_cache_size: Máximo de respuestas históricas cacheadas (LRU)
+            price_cache_size: Máximo de precios cacheados (LRU)
+        """
         self.providers: Dict[DataProviderType, IDataProvider] = {}
         self.provider_priorities: Dict[DataProviderType, ProviderPriority] = {}
         self.active_provider: Optional[IDataProvider] = None
+        self._breakers: Dict[DataProviderType, _Breaker] = {}
+        self._breakers_lock = threading.Lock()
+        
+        # Caches LRU con TTL para consultas repetidas (varios bots / dashboard):
+        # clave -> (expiración monotonic, resultado). Al insertar se descartan las
+        # entradas vencidas y las menos usadas por encima del tamaño máximo
+        self.historical_cache_ttl = historical_cache_ttl
+        self.price_cache_ttl = price_cache_ttl
+        self.historical_cache_size = historical_cache_size
+        self.price_cache_size = price_cache_size
+        self._hist_cache: "OrderedDict[Tuple, Tuple[float, MarketData]]" = OrderedDict()
+        self._price_cache: "OrderedDict[str, Tuple[float, Dict[str, float]]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
         
     def add_provider(
         self, 
@@ -46,6 +111,7 @@ class DataProviderManager:
             provider_type = provider.provider_type
             self.providers[provider_type] = provider
             self.provider_priorities[provider_type] = priority
+            self._breakers[provider_type] = _Breaker()
             
             print(f"{Utils.dateprint()} - [ProviderManager] Agregado {provider_type.value} (prioridad: {priority.value})")
             return True
@@ -85,7 +151,7 @@ class DataProviderManager:
         available_providers = [
             (priority, provider_type, provider)
             for provider_type, provider in self.providers.items()
-            if provider.is_connected()
+            if self._is_available(provider_type, provider)
             for priority in [self.provider_priorities[provider_type]]
         ]
         
@@ -123,24 +189,65 @@ class DataProviderManager:
             fallback_enabled: Si usar failover automático
             
         Returns:
-            MarketData o None si fallan todos los proveedores
+            MarketData o None si fallan todos los proveedores.
+            Las respuestas se cachean (ver _historical_expiry): el MarketData
+            devuelto puede estar compartido y no debe modificarse
         """
-        if not self.active_provider:
-            self._select_active_provider()
+        key = (symbol, timeframe, count, start_time, end_time)
+        entry = self._cache_get(self._hist_cache, key)
+        if entry is not None:
+            return entry
+        
+        data = self._fetch_historical_data(symbol, timeframe, count, start_time, end_time, fallback_enabled)
+        if data:
+            self._cache_put(self._hist_cache, key, self._historical_expiry(data), data, self.historical_cache_size)
+        return data
+    
+    def _historical_expiry(self, data: MarketData) -> float:
+        """
+        Expiración (monotonic) de una respuesta de datos históricos: historical_cache_ttl,
+        acortado para no servir datos viejos una vez cerrada la siguiente vela.
+        """
+        ttl = self.historical_cache_ttl
+        bar_seconds = _TIMEFRAME_SECONDS.get(data.timeframe)
+        if bar_seconds and len(data.data):
+            last_bar = data.data.index[-1]
+            if isinstance(last_bar, pd.Timestamp):
+                if last_bar.tzinfo is None:
+                    last_bar = last_bar.tz_localize("UTC")
+                # La última vela es completa: la siguiente cierra dos velas después de su apertura
+                until_next_close = (last_bar - pd.Timestamp.now(tz="UTC")).total_seconds() + 2 * bar_seconds
+                if until_next_close > 0:
+                    ttl = min(ttl, until_next_close)
+        return time.monotonic() + ttl
+    
+    def _fetch_historical_data(
+        self,
+        symbol: str,
+        timeframe: TimeFrame,
+        count: int,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        fallback_enabled: bool
+    ) -> Optional[MarketData]:
+        """get_historical_data sin cache: proveedor activo y failover."""
+        provider = self._ensure_active_provider()
         
-        if not self.active_provider:
+        if not provider:
             print(f"{Utils.dateprint()} - [ProviderManager] No hay proveedores disponibles")
             return None
         
         # Intentar con proveedor activo
         try:
-            data = self.active_provider.get_historical_data(
+            data = provider.get_historical_data(
                 symbol, timeframe, count, start_time, end_time
             )
             if data:
+                self._record_success(provider.provider_type)
                 return data
         except Exception as e:
             print(f"{Utils.dateprint()} - [ProviderManager] Error en proveedor activo: {e}")
+        self._record_failure(provider.provider_type)
         
         # Failover a otros proveedores si está habilitado
         if fallback_enabled:
@@ -159,21 +266,56 @@ class DataProviderManager:
             fallback_enabled: Si usar failover automático
             
         Returns:
-            Dict con precios o None
+            Dict con precios o None (cacheado price_cache_ttl segundos; cada
+            llamada recibe su propia copia del dict)
         """
-        if not self.active_provider:
-            self._select_active_provider()
+        price = self._cache_get(self._price_cache, symbol)
+        if price is None:
+            price = self._fetch_current_price(symbol, fallback_enabled)
+            if not price:
+                return price
+            self._cache_put(self._price_cache, symbol, time.monotonic() + self.price_cache_ttl, price, self.price_cache_size)
+        return dict(price)
+    
+    def _cache_get(self, cache: OrderedDict, key) -> Any:
+        """Valor vigente de la cache para key (lo marca como usado), o None."""
+        with self._cache_lock:
+            entry = cache.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del cache[key]
+                return None
+            cache.move_to_end(key)
+            return entry[1]
+    
+    def _cache_put(self, cache: OrderedDict, key, expiry: float, value, max_size: int):
+        """Guarda value hasta expiry, descartando vencidas y las menos usadas sobre max_size."""
+        with self._cache_lock:
+            now = time.monotonic()
+            for expired in [k for k, (expires_at, _) in cache.items() if expires_at <= now]:
+                del cache[expired]
+            cache[key] = (expiry, value)
+            cache.move_to_end(key)
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+    
+    def _fetch_current_price(self, symbol: str, fallback_enabled: bool) -> Optional[Dict[str, float]]:
+        """get_current_price sin cache: proveedor activo y failover."""
+        provider = self._ensure_active_provider()
         
-        if not self.active_provider:
+        if not provider:
             return None
         
         # Intentar con proveedor activo
         try:
-            price = self.active_provider.get_current_price(symbol)
+            price = provider.get_current_price(symbol)
             if price:
+                self._record_success(provider.provider_type)
                 return price
         except Exception as e:
             print(f"{Utils.dateprint()} - [ProviderManager] Error obteniendo precio: {e}")
+        self._record_failure(provider.provider_type)
         
         # Failover si está habilitado
         if fallback_enabled:
@@ -197,32 +339,131 @@ class DataProviderManager:
         fallback_providers = [
             (priority, provider_type, provider)
             for provider_type, provider in self.providers.items()
-            if provider != self.active_provider and provider.is_connected()
+            if provider != self.active_provider and self._is_available(provider_type, provider)
             for priority in [self.provider_priorities[provider_type]]
         ]
         
         fallback_providers.sort(key=lambda x: x[0].value)
         
-        for priority, provider_type, provider in fallback_providers:
-            try:
-                print(f"{Utils.dateprint()} - [ProviderManager] Intentando fallback: {provider_type.value}")
+        if not fallback_providers:
+            print(f"{Utils.dateprint()} - [ProviderManager] ❌ Todos los proveedores fallaron")
+            return None
+        
+        # Todos los respaldos se consultan a la vez (un proveedor caído no bloquea a
+        # los demás hasta su timeout) y gana el primero que responda. Cada uno arranca
+        # _FALLBACK_STAGGER segundos después del anterior, así que si responden a la
+        # par gana el de mayor prioridad; los que aún no arrancaron ya no consultan
+        settled = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=len(fallback_providers), thread_name_prefix="ProviderFallback")
+        futures = {}
+        for rank, (_, provider_type, provider) in enumerate(fallback_providers):
+            print(f"{Utils.dateprint()} - [ProviderManager] Intentando fallback: {provider_type.value}")
+            future = executor.submit(
+                self._call_provider, provider, method_name, rank * self._FALLBACK_STAGGER, settled, args, kwargs
+            )
+            futures[future] = (rank, provider_type, provider)
+        
+        try:
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
                 
-                method = getattr(provider, method_name)
-                result = method(*args, **kwargs)
+                successes = []
+                for future in done:
+                    rank, provider_type, provider = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"{Utils.dateprint()} - [ProviderManager] Fallback falló {provider_type.value}: {e}")
+                        result = None
+                    if result:
+                        self._record_success(provider_type)
+                        successes.append((rank, provider_type, provider, result))
+                    else:
+                        self._record_failure(provider_type)
                 
-                if result:
+                if successes:
+                    _, provider_type, provider, result = min(successes, key=lambda s: s[0])
                     print(f"{Utils.dateprint()} - [ProviderManager] ✅ Fallback exitoso: {provider_type.value}")
                     # Actualizar proveedor activo
                     self.active_provider = provider
                     return result
-                    
-            except Exception as e:
-                print(f"{Utils.dateprint()} - [ProviderManager] Fallback falló {provider_type.value}: {e}")
-                continue
+        finally:
+            settled.set()
+            executor.shutdown(wait=False, cancel_futures=True)
         
         print(f"{Utils.dateprint()} - [ProviderManager] ❌ Todos los proveedores fallaron")
         return None
     
+    def _ensure_active_provider(self) -> Optional[IDataProvider]:
+        """Proveedor activo; se vuelve a seleccionar si no hay o su circuito está abierto."""
+        provider = self.active_provider
+        if not provider or not self._is_available(provider.provider_type, provider):
+            provider = self._select_active_provider()
+        return provider
+    
+    def _is_available(self, provider_type: DataProviderType, provider: IDataProvider) -> bool:
+        """
+        True si el proveedor está conectado y su circuit breaker no está abierto.
+        Pasado recovery_s, un circuito abierto pasa a half_open y vuelve a probarse.
+        """
+        breaker = self._breakers.get(provider_type)
+        if breaker is not None and breaker.state == "open":
+            if time.monotonic() - breaker.opened_at < breaker.recovery_s:
+                return False
+            with self._breakers_lock:
+                if breaker.state == "open":
+                    breaker.state = "half_open"
+                    print(f"{Utils.dateprint()} - [ProviderManager] Circuit breaker {provider_type.value}: half_open (reintentando)")
+        return provider.is_connected()
+    
+    def _record_failure(self, provider_type: DataProviderType):
+        """Cuenta un fallo del proveedor y abre su circuito al llegar al umbral."""
+        breaker = self._breakers.get(provider_type)
+        if breaker is None:
+            return
+        
+        with self._breakers_lock:
+            now = time.monotonic()
+            if breaker.fail_count == 0 or now - breaker.first_failure_at > breaker.window_s:
+                breaker.fail_count = 0
+                breaker.first_failure_at = now
+            breaker.fail_count += 1
+            
+            if breaker.state == "half_open" or (
+                breaker.state == "closed" and breaker.fail_count >= breaker.failure_threshold
+            ):
+                breaker.state = "open"
+                breaker.opened_at = now
+                print(f"{Utils.dateprint()} - [ProviderManager] Circuit breaker {provider_type.value}: "
+                      f"open, proveedor omitido {breaker.recovery_s:.0f}s ({breaker.fail_count} fallos)")
+    
+    def _record_success(self, provider_type: DataProviderType):
+        """Reinicia el contador de fallos y cierra el circuito del proveedor."""
+        breaker = self._breakers.get(provider_type)
+        if breaker is None or (breaker.state == "closed" and breaker.fail_count == 0):
+            return
+        
+        with self._breakers_lock:
+            if breaker.state != "closed":
+                print(f"{Utils.dateprint()} - [ProviderManager] Circuit breaker {provider_type.value}: closed")
+            breaker.state = "closed"
+            breaker.fail_count = 0
+    
+    @staticmethod
+    def _call_provider(
+        provider: IDataProvider,
+        method_name: str,
+        delay: float,
+        settled: threading.Event,
+        args: tuple,
+        kwargs: dict
+    ) -> Any:
+        """Ejecuta method_name en el proveedor tras delay segundos, salvo que el failover ya terminó."""
+        if delay and settled.wait(delay):
+            return None
+        return getattr(provider, method_name)(*args, **kwargs)
+    
     def get_provider_status(self) -> Dict[str, Any]:
         """
         Obtiene estado de todos los proveedores.
@@ -238,7 +479,8 @@ class DataProviderManager:
         for provider_type, provider in self.providers.items():
             status["providers"][provider_type.value] = {
                 "connected": provider.is_connected(),
-                "priority": self.provider_priorities[provider_type].value
+                "priority": self.provider_priorities[provider_type].value,
+                "circuit": self._breakers[provider_type].state
             }
         
         return status
@@ -1,4 +1,5 @@
 from strategies.strategy_base import StrategyBase
+import numpy as np
 import pandas as pd
 from datetime import datetime
 from typing import Optional, Tuple
@@ -15,6 +16,9 @@ class SimpleTimeStrategy(StrategyBase):
     - Fixed TP: 300 pips
     """
 
+    # Seconds between consecutive buy signals (20 minutes)
+    REOPEN_SECONDS = 1200
+
     def __init__(self):
         super().__init__()
         self.magic_number = 1  # Unique identifier for this strategy
@@ -56,13 +60,52 @@ class SimpleTimeStrategy(StrategyBase):
                 time_diff_seconds = (current_time - self.position_open_time).total_seconds()
             
             # After 20 minutes (1200 seconds), close and immediately reopen
-            if time_diff_seconds >= 1200:  # 1200 seconds = 20 minutes
+            if time_diff_seconds >= self.REOPEN_SECONDS:
                 self.position_open_time = current_time
                 self.last_signal_time = current_time
                 return 'buy'
         
         return 'hold'
 
+    def generate_signals_vectorized(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        Vectorized equivalent of generate_signal for a whole DataFrame (used by backtests).
+
+        The first bar buys; each following buy fires on the first bar at least
+        REOPEN_SECONDS after the previous one. Unlike generate_signal, it does not
+        touch the live-trading state of the instance.
+
+        Returns:
+            int8 array with one code per bar: 1 = buy, -1 = sell, 0 = hold
+        """
+        times = data['time'] if 'time' in data.columns else data.index
+        if pd.api.types.is_numeric_dtype(times):
+            t = np.asarray(times, dtype=np.float64)  # epoch seconds
+            wait = self.REOPEN_SECONDS
+        else:
+            t = pd.DatetimeIndex(times).values.astype('datetime64[ns]').view(np.int64)  # epoch nanoseconds
+            wait = self.REOPEN_SECONDS * 1_000_000_000
+
+        n = len(t)
+        signals = np.zeros(n, dtype=np.int8)
+        if n == 0:
+            return signals
+
+        if np.all(t[1:] >= t[:-1]):
+            # Sorted timestamps: jump straight to the next signal bar
+            i = 0
+            while i < n:
+                signals[i] = 1
+                i = int(np.searchsorted(t, t[i] + wait, side='left'))
+        else:
+            last = t[0]
+            signals[0] = 1
+            for i in range(1, n):
+                if t[i] - last >= wait:
+                    signals[i] = 1
+                    last = t[i]
+        return signals
+
     def get_parameters(self) -> dict:
         return {
             'strategy_name': 'SimpleTimeStrategy',
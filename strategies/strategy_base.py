@@ -1,7 +1,6 @@
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional, Tuple
 import pandas as pd
-import MetaTrader5 as mt5
 
 class StrategyBase(ABC):
     """
@@ -105,6 +104,9 @@ class StrategyBase(ABC):
         Uses symbol search to handle suffixes correctly.
         """
         try:
+            # MT5 is imported on first use so backtests can load strategies without the terminal package
+            import MetaTrader5 as mt5
+
             # Try to find symbol info with potential suffix
             info = None
             
@@ -146,6 +148,7 @@ class StrategyBase(ABC):
         """
         Helper: Get MT5 symbol info.
         """
+        import MetaTrader5 as mt5
         return mt5.symbol_info(symbol)
     
     @staticmethod
@@ -74,7 +74,7 @@ def get_trade_repository() -> TradeRepository:
             account_id = account_info.login
     except Exception:
         account_id = None
-    return TradeRepository(account_id=account_id)
+    return TradeRepository.shared(account_id=account_id)
 
 
 def main():
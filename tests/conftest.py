@@ -0,0 +1,35 @@
+"""
+Configuración común de los tests.
+
+Los tests de datos (repositorio, logger, sync, proveedores) no necesitan MT5 ni
+red: si el paquete MetaTrader5 no está instalado (Linux/CI) se registra un
+módulo mínimo con las constantes que usan esos módulos; los deals de MT5 los
+simula cada test con monkeypatch.
+"""
+import importlib.util
+import os
+import sys
+import types
+
+import pytest
+
+# Agregar el directorio raíz al path para importaciones
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if importlib.util.find_spec("MetaTrader5") is None:
+    _mt5 = types.ModuleType("MetaTrader5")
+    _mt5.DEAL_ENTRY_IN = 0
+    _mt5.DEAL_ENTRY_OUT = 1
+    _mt5.history_deals_get = lambda *args, **kwargs: None
+    _mt5.last_error = lambda: (0, "")
+    sys.modules["MetaTrader5"] = _mt5
+
+
+@pytest.fixture
+def repository(tmp_path):
+    """TradeRepository sobre un archivo SQLite temporal."""
+    from data.repositories.trade_repository import TradeRepository
+    
+    repo = TradeRepository(db_path=str(tmp_path / "trades.db"))
+    yield repo
+    repo.close()
@@ -0,0 +1,72 @@
+"""
+Tests de regresión de los loops compilados de backtesting (run_bt/run_sweep y el
+_backtest_loop reanudable del motor unificado).
+
+Los valores esperados se registraron con la implementación original en Python
+puro (loop barra a barra con data.iloc) sobre el mismo DataFrame sintético; con
+y sin Numba los kernels deben reproducirlos.
+"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backtesting'))
+
+from backtesting.simple_time_strategy_bt import BacktestingEngine
+from backtesting.unified_backtest_engine import UnifiedBacktestingEngine
+from strategies.simple_time_strategy import SimpleTimeStrategy
+
+
+# (sl_pips, tp_pips, hold_seconds) -> (total_pnl, total_trades)
+SWEEP_BASELINE = {
+    (50.0, 100.0, 600.0): (-15.406999, 100),
+    (50.0, 100.0, 1800.0): (-16.569776, 96),
+    (50.0, 300.0, 600.0): (-18.146394, 100),
+    (50.0, 300.0, 1800.0): (-26.840419, 84),
+    (100.0, 100.0, 600.0): (-18.000479, 100),
+    (100.0, 100.0, 1800.0): (-20.802374, 83),
+    (100.0, 300.0, 600.0): (-20.873942, 100),
+    (100.0, 300.0, 1800.0): (-25.835272, 67),
+}
+
+
+@pytest.fixture(scope='module')
+def data() -> pd.DataFrame:
+    """Velas de 1 minuto de un paseo aleatorio con semilla fija (llegan a SL y TP)."""
+    n = 2000
+    rng = np.random.default_rng(42)
+    close = 1.10 + np.cumsum(rng.normal(0, 0.002, n))
+    open_ = np.concatenate(([1.10], close[:-1]))
+    spread = np.abs(rng.normal(0, 0.002, n))
+    return pd.DataFrame({'Open': open_, 'High': np.maximum(open_, close) + spread,
+                         'Low': np.minimum(open_, close) - spread, 'Close': close, 'Volume': 100.0},
+                        index=pd.date_range('2024-01-01', periods=n, freq='min'))
+
+
+def test_backtest_matches_baseline(data):
+    results = BacktestingEngine().backtest(data)
+
+    assert results['total_trades'] == 100
+    assert results['total_pnl'] == pytest.approx(-5.465318, abs=1e-6)
+    assert results['final_capital'] == pytest.approx(9994.534682, abs=1e-6)
+
+
+def test_sweep_matches_baseline(data):
+    results = BacktestingEngine().sweep(data, [50.0, 100.0], [100.0, 300.0], [600.0, 1800.0])
+
+    assert len(results) == len(SWEEP_BASELINE)
+    for row in results.itertuples(index=False):
+        total_pnl, total_trades = SWEEP_BASELINE[(row.sl_pips, row.tp_pips, row.hold_seconds)]
+        assert row.total_trades == total_trades
+        assert row.total_pnl == pytest.approx(total_pnl, abs=1e-6)
+
+
+def test_unified_backtest_matches_baseline(data):
+    results = UnifiedBacktestingEngine().backtest(data, SimpleTimeStrategy)
+
+    assert results['total_trades'] == 36
+    assert results['total_pnl'] == pytest.approx(-0.012367, abs=1e-6)
+    assert results['final_capital'] == pytest.approx(9999.987633, abs=1e-6)
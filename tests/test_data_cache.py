@@ -0,0 +1,42 @@
+"""
+Tests de la caché de arrays de backtesting: reutilización por DataFrame e
+invalidación al editar los datos.
+"""
+import numpy as np
+import pandas as pd
+
+from backtesting._data_cache import cached, clear_cache, extract_ohlc
+
+
+def _frame(n: int = 50) -> pd.DataFrame:
+    close = 1.1 + np.arange(n) * 0.0001
+    return pd.DataFrame({'Open': close, 'High': close + 0.0005, 'Low': close - 0.0005, 'Close': close,
+                         'Volume': 100.0}, index=pd.date_range('2024-01-01', periods=n, freq='min'))
+
+
+def test_repeated_calls_reuse_the_arrays():
+    df = _frame()
+
+    assert extract_ohlc(df) is extract_ohlc(df)
+    assert cached(df, 'kind', lambda d: object()) is cached(df, 'kind', lambda d: object())
+
+
+def test_replaced_column_invalidates_every_kind():
+    df = _frame()
+    extract_ohlc(df)
+    doubled = cached(df, 'doubled', lambda d: d['Close'].to_numpy() * 2)
+
+    df['Close'] = df['Close'] + 1.0
+
+    np.testing.assert_array_equal(extract_ohlc(df).close, df['Close'].to_numpy())
+    np.testing.assert_array_equal(cached(df, 'doubled', lambda d: d['Close'].to_numpy() * 2), doubled + 2.0)
+
+
+def test_clear_cache_after_in_place_edit():
+    df = _frame()
+    extract_ohlc(df)
+
+    df.loc[:, 'High'] = df['High'] + 1.0
+    clear_cache()
+
+    np.testing.assert_array_equal(extract_ohlc(df).high, df['High'].to_numpy())
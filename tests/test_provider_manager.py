@@ -0,0 +1,188 @@
+"""
+Tests de DataProviderManager con proveedores simulados (sin red): caches,
+failover entre proveedores y circuit breaker.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from data_providers import DataProviderManager, DataProviderType, MarketData, ProviderPriority, TimeFrame
+from data_providers.interfaces.data_provider_interface import IDataProvider
+
+PRIORITIES = [ProviderPriority.PRIMARY, ProviderPriority.SECONDARY, ProviderPriority.FALLBACK]
+TYPES = [DataProviderType.OANDA, DataProviderType.MT5, DataProviderType.YAHOO]
+
+
+class StubProvider(IDataProvider):
+    """Proveedor simulado: cuenta llamadas y puede fallar o tardar."""
+
+    def __init__(self, provider_type: DataProviderType, fail: bool = False, delay: float = 0.0):
+        self._type = provider_type
+        self.fail = fail
+        self.delay = delay
+        self.calls = 0
+
+    def connect(self) -> bool:
+        return True
+
+    def disconnect(self) -> bool:
+        return True
+
+    def is_connected(self) -> bool:
+        return True
+
+    def get_historical_data(self, symbol, timeframe, count=100, start_time=None, end_time=None) -> Optional[MarketData]:
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError('proveedor caído')
+        last_bar = pd.Timestamp.now(tz='UTC').floor('h') - pd.Timedelta(hours=1)
+        data = pd.DataFrame({'Close': [1.0]}, index=pd.DatetimeIndex([last_bar], name='time'))
+        return MarketData(symbol, timeframe, data, self._type, datetime.now())
+
+    def get_current_price(self, symbol: str) -> Optional[Dict[str, float]]:
+        self.calls += 1
+        time.sleep(self.delay)
+        return None if self.fail else {'bid': 1.0, 'ask': 1.0002, 'price': 1.0001}
+
+    def get_symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return None
+
+    def get_available_symbols(self) -> List[str]:
+        return []
+
+    def is_market_open(self, symbol: str) -> bool:
+        return True
+
+    @property
+    def provider_type(self) -> DataProviderType:
+        return self._type
+
+
+def _manager(*providers: StubProvider, **kwargs) -> DataProviderManager:
+    kwargs.setdefault('historical_cache_ttl', 0)
+    kwargs.setdefault('price_cache_ttl', 0)
+    manager = DataProviderManager(**kwargs)
+    for provider, priority in zip(providers, PRIORITIES):
+        manager.add_provider(provider, priority)
+    manager.initialize_providers()
+    return manager
+
+
+# ==================== CACHES ====================
+
+def test_historical_cache_reuses_and_is_bounded():
+    provider = StubProvider(DataProviderType.OANDA)
+    manager = _manager(provider, historical_cache_ttl=30, historical_cache_size=3)
+
+    first = manager.get_historical_data('EURUSD', TimeFrame.H1, 10)
+    assert manager.get_historical_data('EURUSD', TimeFrame.H1, 10) is first
+    assert provider.calls == 1
+
+    for day in range(10):
+        manager.get_historical_data('EURUSD', TimeFrame.H1, 10, datetime(2024, 1, 1) + timedelta(days=day))
+    assert len(manager._hist_cache) == 3
+
+
+def test_historical_cache_expires_at_next_bar_close():
+    manager = _manager(StubProvider(DataProviderType.OANDA), historical_cache_ttl=10_000)
+    data = manager.get_historical_data('EURUSD', TimeFrame.H1, 10)
+
+    assert manager._historical_expiry(data) - time.monotonic() <= 3600
+
+
+def test_price_cache_returns_copies_and_purges_expired():
+    provider = StubProvider(DataProviderType.OANDA)
+    manager = _manager(provider, price_cache_ttl=5)
+
+    manager.get_current_price('EURUSD')['price'] = 99
+    assert manager.get_current_price('EURUSD')['price'] == 1.0001
+    assert provider.calls == 1
+
+    manager.price_cache_ttl = 0.01
+    manager.get_current_price('GBPUSD')
+    time.sleep(0.02)
+    manager.get_current_price('USDJPY')
+    assert list(manager._price_cache) == ['EURUSD', 'USDJPY']
+
+
+# ==================== FAILOVER ====================
+
+def test_fastest_fallback_wins_over_slow_one():
+    primary = StubProvider(TYPES[0], fail=True)
+    slow = StubProvider(TYPES[1], delay=1.0)
+    fast = StubProvider(TYPES[2], delay=0.01)
+    manager = _manager(primary, slow, fast)
+
+    start = time.monotonic()
+    assert manager.get_current_price('EURUSD') is not None
+    assert time.monotonic() - start < 0.5
+    assert manager.active_provider is fast
+
+
+def test_equally_fast_fallbacks_keep_priority_order():
+    primary = StubProvider(TYPES[0], fail=True)
+    secondary = StubProvider(TYPES[1], delay=0.01)
+    fallback = StubProvider(TYPES[2], delay=0.01)
+    manager = _manager(primary, secondary, fallback)
+
+    assert manager.get_historical_data('EURUSD', TimeFrame.H1, 5).provider == TYPES[1]
+    time.sleep(0.1)
+    assert manager.active_provider is secondary
+    assert fallback.calls == 0
+
+
+def test_all_providers_failing_returns_none():
+    manager = _manager(*(StubProvider(provider_type, fail=True) for provider_type in TYPES))
+
+    assert manager.get_historical_data('EURUSD', TimeFrame.H1, 5) is None
+
+
+# ==================== CIRCUIT BREAKER ====================
+
+def test_circuit_opens_skips_provider_and_recovers():
+    primary = StubProvider(TYPES[0], fail=True)
+    secondary = StubProvider(TYPES[1])
+    manager = _manager(primary, secondary)
+    breaker = manager._breakers[TYPES[0]]
+    breaker.recovery_s = 0.2
+
+    for _ in range(breaker.failure_threshold):
+        manager.active_provider = primary
+        assert manager.get_current_price('EURUSD') is not None
+    assert breaker.state == 'open'
+    assert manager.get_provider_status()['providers'][TYPES[0].value]['circuit'] == 'open'
+
+    # Circuito abierto: el primario no se llama
+    primary.calls = 0
+    manager.active_provider = None
+    manager.get_current_price('EURUSD')
+    assert primary.calls == 0
+    assert manager.active_provider is secondary
+
+    # Pasado recovery_s se prueba de nuevo (half_open) y, si responde, se cierra
+    time.sleep(0.25)
+    primary.fail = False
+    manager.active_provider = None
+    manager.get_current_price('EURUSD')
+    assert primary.calls == 1
+    assert breaker.state == 'closed'
+    assert manager.active_provider is primary
+
+
+def test_failed_half_open_probe_reopens_circuit():
+    primary = StubProvider(TYPES[0], fail=True)
+    manager = _manager(primary, StubProvider(TYPES[1]))
+    breaker = manager._breakers[TYPES[0]]
+    breaker.recovery_s = 0.05
+
+    for _ in range(breaker.failure_threshold):
+        manager.active_provider = primary
+        manager.get_current_price('EURUSD')
+    time.sleep(0.06)
+    manager.active_provider = None
+    manager.get_current_price('EURUSD')
+
+    assert breaker.state == 'open'
@@ -0,0 +1,149 @@
+"""
+Tests de TradeLogger sobre un SQLite temporal: hilo escritor de señales y
+cierre de trades con y sin transacción.
+"""
+import gc
+import threading
+import time
+import weakref
+
+import pytest
+
+import data.trade_logger as trade_logger
+from data.models import Trade, TradeStatus
+from data.trade_logger import TradeLogger
+
+
+def _log_signals(logger: TradeLogger, bot_id: str, count: int):
+    for i in range(count):
+        logger.log_signal(bot_id, 'Strategy', 'EURUSD', 'H1', 'buy', 1.0 + i, indicators_snapshot={'i': i})
+
+
+def _writer_threads() -> int:
+    return sum(thread.name == 'TradeLogger-signals' for thread in threading.enumerate())
+
+
+def _run_in_thread(func, timeout: float = 5.0):
+    """Ejecuta func en otro hilo; devuelve (terminó a tiempo, resultado)."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), result[0] if result else None
+
+
+# ==================== SEÑALES EN SEGUNDO PLANO ====================
+
+def test_signals_are_saved_in_batches(repository):
+    logger = TradeLogger(repository=repository, signal_batch_size=50)
+    _log_signals(logger, 'b', 250)
+
+    # get_recent_signals espera a que el escritor guarde las pendientes
+    signals = logger.get_recent_signals('b', limit=1000)
+    assert len(signals) == 250
+    assert {s.price_at_signal for s in signals} == {1.0 + i for i in range(250)}
+    logger.flush_signals()
+
+
+def test_collected_logger_stops_its_writer(repository):
+    writers_before = _writer_threads()
+    logger = TradeLogger(repository=repository)
+    _log_signals(logger, 'b', 30)
+    assert _writer_threads() == writers_before + 1
+
+    ref = weakref.ref(logger)
+    del logger
+    gc.collect()
+
+    deadline = time.monotonic() + 5
+    while _writer_threads() > writers_before and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert ref() is None
+    assert _writer_threads() == writers_before
+    # Las señales pendientes se guardaron antes de terminar
+    assert len(repository.get_signals_by_bot('b', 1000)) == 30
+
+
+def test_atexit_hook_flushes_every_logger(repository):
+    loggers = [TradeLogger(repository=repository, signal_flush_seconds=1.0) for _ in range(2)]
+    for n, logger in enumerate(loggers):
+        _log_signals(logger, f'bot{n}', 5)
+
+    trade_logger._flush_all_loggers()
+
+    assert len(repository.get_signals_by_bot('bot0')) == 5
+    assert len(repository.get_signals_by_bot('bot1')) == 5
+
+
+# ==================== TRADES ====================
+
+def _open(logger: TradeLogger, ticket: int, bot_id: str = 'b') -> int:
+    return logger.log_trade_opened(ticket, 1, bot_id, 'Strategy', 'EURUSD', 'buy', 0.1, 1.1000, 1.0950, 1.1100)
+
+
+def test_close_trade_opened_by_another_logger(repository):
+    _open(TradeLogger(repository=repository), 7)
+
+    assert TradeLogger(repository=repository).log_trade_closed(7, 1.1050, 5.0, 'tp')
+
+    trade = repository.get_trade_by_ticket(7)
+    assert trade.status == TradeStatus.CLOSED
+    assert trade.profit_pips == pytest.approx(50.0)
+    assert trade.close_reason == 'tp'
+
+
+def test_open_trades_cache_is_bounded(repository):
+    logger = TradeLogger(repository=repository, open_trades_cache_size=3)
+    for ticket in range(1, 6):
+        _open(logger, ticket)
+
+    assert list(logger._open_trades) == [3, 4, 5]
+    # Un trade descartado de la caché se sigue cerrando con los datos de la base de datos
+    assert logger.log_trade_closed(1, 1.1050, 5.0)
+    assert repository.get_trade_by_ticket(1).status == TradeStatus.CLOSED
+
+
+def test_close_unknown_trade_returns_false(repository):
+    assert not TradeLogger(repository=repository).log_trade_closed(404, 1.0, 0.0)
+
+
+def test_transaction_rollback_forgets_trades_opened_in_block(repository):
+    logger = TradeLogger(repository=repository)
+    _open(logger, 1)
+
+    with pytest.raises(RuntimeError):
+        with logger.transaction():
+            _open(logger, 2)
+            raise RuntimeError
+
+    assert set(logger._open_trades) == {1}
+    assert repository.get_trade_by_ticket(2) is None
+    assert not logger.log_trade_closed(2, 1.2, 1.0)
+
+
+def test_close_inside_transaction_sees_trade_saved_in_block(repository):
+    logger = TradeLogger(repository=repository)
+
+    with logger.transaction():
+        repository.save_trade(Trade(ticket=5, bot_id='x', symbol='EURUSD', action='buy', entry_price=1.1))
+        assert logger.log_trade_closed(5, 1.2, 10.0)
+
+    assert repository.get_trade_by_ticket(5).status == TradeStatus.CLOSED
+    assert repository.get_bot_stats('x')['closed_trades'] == 1
+
+
+def test_signals_inside_transaction_do_not_wait_for_the_writer(repository):
+    logger = TradeLogger(repository=repository, signal_queue_size=3)
+
+    def log_and_read():
+        with logger.transaction():
+            _log_signals(logger, 'b', 1)
+            time.sleep(0.05)  # el escritor ya la tomó y espera para completar el lote
+            _log_signals(logger, 'b', 9)  # más que la capacidad de la cola
+            return len(logger.get_recent_signals('b', limit=100))
+
+    finished, seen = _run_in_thread(log_and_read)
+    assert finished
+    assert seen == 10
+    logger.flush_signals()
+    assert len(repository.get_signals_by_bot('b', 100)) == 10
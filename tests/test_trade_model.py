@@ -0,0 +1,53 @@
+"""
+Tests del modelo Trade: serialización JSON con y sin orjson.
+"""
+import json
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data.models.trade as trade_module
+from data.models import Trade, TradeStatus, trades_to_ndjson
+
+
+def _trade(**overrides) -> Trade:
+    fields = dict(id=1, ticket=10, bot_id='b', symbol='EURUSD', action='buy', volume=0.1,
+                  entry_price=1.1, exit_price=1.2, profit=10.0, status=TradeStatus.CLOSED,
+                  opened_at=datetime(2024, 1, 2, 10), closed_at=datetime(2024, 1, 2, 12, 30, 0, 500))
+    fields.update(overrides)
+    return Trade(**fields)
+
+
+@pytest.fixture(params=[True, False], ids=['orjson', 'json'])
+def json_backend(request, monkeypatch):
+    if request.param and not trade_module.ORJSON_AVAILABLE:
+        pytest.skip('orjson no instalado')
+    monkeypatch.setattr(trade_module, 'ORJSON_AVAILABLE', request.param)
+
+
+def test_json_round_trip(json_backend):
+    trade = _trade()
+
+    assert Trade.from_json_bytes(trade.to_json_bytes()) == trade
+    assert json.loads(trade.to_json_bytes()) == trade.to_dict()
+
+
+def test_json_accepts_pandas_and_numpy_values(json_backend):
+    trade = _trade(ticket=np.int64(10), profit=np.float64(10.5), volume=np.float32(0.5),
+                   opened_at=pd.Timestamp('2024-01-02 10:00'), closed_at=pd.Timestamp('2024-01-02 12:30'))
+
+    restored = Trade.from_json_bytes(trade.to_json_bytes())
+
+    assert (restored.ticket, restored.profit, restored.volume) == (10, 10.5, 0.5)
+    assert (restored.opened_at, restored.closed_at) == (datetime(2024, 1, 2, 10), datetime(2024, 1, 2, 12, 30))
+
+
+def test_trades_to_ndjson(json_backend):
+    trades = [_trade(id=1, ticket=10), _trade(id=2, ticket=11, profit=None, status=TradeStatus.OPENED, closed_at=None)]
+
+    lines = trades_to_ndjson(trades).splitlines()
+
+    assert [Trade.from_json_bytes(line) for line in lines] == trades
+    assert trades_to_ndjson([]) == b''
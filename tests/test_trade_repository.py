@@ -0,0 +1,174 @@
+"""
+Tests de TradeRepository sobre un SQLite temporal: pool de lectores y
+generadores, caché de estadísticas y transaction().
+"""
+import gc
+import sqlite3
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from data.models import Trade, TradeStatus
+
+
+def _closed(ticket: int, bot_id: str, profit: float) -> Trade:
+    return Trade(ticket=ticket, bot_id=bot_id, symbol='EURUSD', action='buy', entry_price=1.1,
+                 exit_price=1.2, profit=profit, status=TradeStatus.CLOSED, closed_at=datetime.now())
+
+
+def _read_in_thread(func, timeout: float = 2.0):
+    """Ejecuta func en otro hilo; devuelve (terminó a tiempo, resultado)."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(func()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive(), result[0] if result else None
+
+
+# ==================== POOL DE LECTORES Y GENERADORES ====================
+
+def test_partially_consumed_generators_do_not_exhaust_reader_pool(repository):
+    repository.save_trades_batch([Trade(ticket=i, bot_id='b') for i in range(600)])
+
+    # Más generadores a medio consumir que lectores en el pool
+    generators = [repository.iter_all_trades() for _ in range(6)]
+    for generator in generators:
+        next(generator)
+
+    finished, open_trades = _read_in_thread(repository.get_open_trades)
+    assert finished
+    assert len(open_trades) == 600
+    assert sum(1 for _ in generators[0]) + 1 == 600
+
+    del generators
+    gc.collect()
+    assert repository._readers.qsize() == 4
+
+
+def test_iter_and_list_queries_return_the_same_trades(repository):
+    repository.save_trades_batch([Trade(ticket=i, bot_id='a' if i % 2 else 'b') for i in range(1, 3001)])
+
+    assert [t.ticket for t in repository.iter_all_trades(limit=5000)] == \
+        [t.ticket for t in repository.get_all_trades(limit=5000)]
+    assert [t.ticket for t in repository.iter_trades_by_bot('a', limit=2000)] == \
+        [t.ticket for t in repository.get_trades_by_bot('a', limit=2000)]
+
+
+def test_date_range_accepts_timestamps(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b', opened_at=datetime(2024, 1, 2, 10)))
+
+    trades = repository.get_trades_by_date_range(pd.Timestamp('2024-01-01'), pd.Timestamp('2024-01-03'))
+    assert [t.ticket for t in trades] == [1]
+
+
+# ==================== CACHÉ DE ESTADÍSTICAS ====================
+
+def test_stats_follow_inserts_and_updates(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b', symbol='EURUSD', action='buy', entry_price=1.1))
+    assert repository.get_bot_stats('b')['open_trades'] == 1
+
+    repository.update_trade(_closed(1, 'b', 10.0))
+    stats = repository.get_bot_stats('b')
+    assert (stats['closed_trades'], stats['wins'], stats['total_profit']) == (1, 1, 10.0)
+    assert repository.get_all_bots_stats() == [stats]
+
+
+def test_stats_returned_are_copies(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b'))
+    repository.get_bot_stats('b')['total_trades'] = 99
+    repository.get_all_bots_stats()[0]['total_trades'] = 99
+
+    assert repository.get_bot_stats('b')['total_trades'] == 1
+    assert repository.get_all_bots_stats()[0]['total_trades'] == 1
+
+
+def test_stats_see_commits_from_other_connections(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b'))
+    assert repository.get_bot_stats('b')['total_trades'] == 1
+
+    # Otro proceso escribiendo en la misma base de datos
+    other = sqlite3.connect(repository.db_path)
+    other.execute("INSERT INTO trades (ticket, bot_id, status) VALUES (2, 'b', 'opened')")
+    other.commit()
+    other.close()
+
+    assert repository.get_bot_stats('b')['total_trades'] == 2
+
+
+def test_stats_after_commit_and_rollback(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b'))
+    assert repository.get_bot_stats('b')['total_trades'] == 1
+
+    with repository.transaction():
+        repository.save_trade(Trade(ticket=2, bot_id='b'))
+        assert repository.get_bot_stats('b')['total_trades'] == 2
+        assert repository.get_all_bots_stats()[0]['total_trades'] == 2
+    assert repository.get_bot_stats('b')['total_trades'] == 2
+    assert repository.get_all_bots_stats()[0]['total_trades'] == 2
+
+    with pytest.raises(ValueError):
+        with repository.transaction():
+            repository.save_trade(Trade(ticket=3, bot_id='b'))
+            assert repository.get_bot_stats('b')['total_trades'] == 3
+            raise ValueError
+    assert repository.get_bot_stats('b')['total_trades'] == 2
+    assert repository.get_all_bots_stats()[0]['total_trades'] == 2
+
+
+def test_stats_do_not_wait_for_another_threads_transaction(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b'))
+
+    with repository.transaction():
+        repository.save_trade(Trade(ticket=2, bot_id='b'))
+
+        finished, stats = _read_in_thread(lambda: repository.get_bot_stats('b'))
+        assert finished
+        assert stats['total_trades'] == 1
+        finished, all_stats = _read_in_thread(repository.get_all_bots_stats)
+        assert finished
+        assert all_stats[0]['total_trades'] == 1
+
+    assert repository.get_bot_stats('b')['total_trades'] == 2
+
+
+# ==================== TRANSACCIONES ====================
+
+def test_transaction_rollback_discards_all_writes(repository):
+    repository.save_trade(Trade(ticket=1, bot_id='b', symbol='EURUSD', action='buy', entry_price=1.1))
+
+    with pytest.raises(RuntimeError):
+        with repository.transaction():
+            repository.save_trades_batch([Trade(ticket=2, bot_id='b'), Trade(ticket=3, bot_id='b')])
+            repository.update_trade(_closed(1, 'b', 5.0))
+            raise RuntimeError('falla a mitad del bloque')
+
+    assert sorted(t.ticket for t in repository.get_all_trades()) == [1]
+    assert repository.get_trade_by_ticket(1).status == TradeStatus.OPENED
+    assert not repository._writer.in_transaction
+
+
+def test_nested_transaction_joins_the_outer_one(repository):
+    with pytest.raises(RuntimeError):
+        with repository.transaction():
+            with repository.transaction():
+                repository.save_trade(Trade(ticket=1, bot_id='b'))
+            raise RuntimeError
+
+    assert repository.get_trade_by_ticket(1) is None
+
+
+def test_reads_inside_transaction_see_its_writes_only_in_its_thread(repository):
+    with repository.transaction():
+        repository.save_trade(Trade(ticket=5, bot_id='x', symbol='EURUSD', action='buy', entry_price=1.1))
+
+        assert repository.get_trade_by_ticket(5) is not None
+        assert repository.get_close_context(5).entry_price == 1.1
+        assert [t.ticket for t in repository.iter_all_trades()] == [5]
+
+        finished, seen = _read_in_thread(lambda: repository.get_trade_by_ticket(5))
+        assert finished
+        assert seen is None
+
+    assert repository.get_trade_by_ticket(5) is not None
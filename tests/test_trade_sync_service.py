@@ -0,0 +1,189 @@
+"""
+Tests de TradeSyncService con deals de MT5 simulados: planificador compartido,
+sincronización incremental y posiciones abiertas antes de la ventana consultada.
+"""
+import random
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pytest
+
+import data.trade_sync_service as trade_sync_service
+from data.models import Trade, TradeStatus
+from data.repositories.trade_repository import TradeRepository
+from data.trade_sync_service import TradeSyncService, _SyncScheduler
+
+Deal = namedtuple('Deal', 'ticket order time type entry magic position_id volume price commission swap profit symbol comment')
+
+NOW = int(time.time())
+
+
+def _entry(position_id: int, opened: int, order: int, deal_type: int = 0) -> Deal:
+    return Deal(position_id * 10, order, opened, deal_type, 0, 1, position_id, 0.1, 1.1000, -0.5, 0.0, 0.0, 'EURUSD', 'FWK')
+
+
+def _exit(position_id: int, closed: int, profit: float, deal_type: int = 1, comment: str = '[tp 1.1100]') -> Deal:
+    return Deal(position_id * 10 + 1, position_id * 10 + 1, closed, deal_type, 1, 1, position_id, 0.1, 1.1100, -0.5, 0.0, profit, 'EURUSD', comment)
+
+
+def _make_history():
+    """Historial de 3 días: posiciones abiertas y cerradas en distintos momentos."""
+    rnd = random.Random(7)
+    deals = []
+    for n in range(1, 300):
+        position_id = 10_000 + n
+        opened = NOW - rnd.randint(0, 3 * 86400)
+        deal_type = rnd.randint(0, 1)
+        deals.append(_entry(position_id, opened, 50_000 + n, deal_type))
+        if rnd.random() < 0.7:
+            closed = min(NOW, opened + rnd.randint(1, 9999))
+            deals.append(_exit(position_id, closed, rnd.uniform(-10, 10), 1 - deal_type, rnd.choice(['[tp 1.1]', '[sl 1.0]', ''])))
+    return deals
+
+
+class _FakeHistory:
+    """history_deals_get simulado: solo devuelve los deals ocurridos hasta `now`."""
+
+    def __init__(self, deals):
+        self.deals = deals
+        self.now = NOW
+        self.ranges = []
+        self.positions = []
+
+    def __call__(self, *args, position=None, **kwargs):
+        visible = [deal for deal in self.deals if deal.time <= self.now]
+        if position is not None:
+            self.positions.append(position)
+            return tuple(deal for deal in visible if deal.position_id == position)
+        from_date, to_date = args
+        self.ranges.append(from_date)
+        return tuple(deal for deal in visible if deal.time >= from_date.timestamp())
+
+
+@pytest.fixture
+def history(monkeypatch):
+    fake = _FakeHistory(_make_history())
+    monkeypatch.setattr(trade_sync_service.mt5, 'history_deals_get', fake)
+    return fake
+
+
+def _rows(repository: TradeRepository):
+    with sqlite3.connect(repository.db_path) as conn:
+        return conn.execute(
+            'SELECT ticket, bot_id, action, exit_price, profit, status, close_reason FROM trades ORDER BY ticket'
+        ).fetchall()
+
+
+# ==================== PLANIFICADOR ====================
+
+def test_scheduler_runs_jobs_on_one_thread_until_removed():
+    scheduler = _SyncScheduler()
+    calls = {'a': 0, 'b': 0}
+    threads = set()
+
+    def job(name):
+        def run():
+            calls[name] += 1
+            threads.add(threading.current_thread().name)
+        return run
+
+    job_a = scheduler.add_job(job('a'), 0.05)
+    job_b = scheduler.add_job(job('b'), 0.05, delay=0.02)
+    time.sleep(0.3)
+    scheduler.remove_job(job_a)
+    time.sleep(0.06)
+    calls_a = calls['a']
+    time.sleep(0.2)
+    scheduler.remove_job(job_b)
+
+    assert calls_a >= 3 and calls['b'] >= 3
+    assert calls['a'] == calls_a
+    assert threads == {'TradeSyncScheduler'}
+
+
+def test_scheduler_survives_failing_job():
+    scheduler = _SyncScheduler()
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise RuntimeError('MT5 desconectado')
+
+    job_id = scheduler.add_job(failing, 0.02)
+    time.sleep(0.15)
+    scheduler.remove_job(job_id)
+
+    assert len(calls) >= 2
+
+
+def test_service_start_stop(repository):
+    service = TradeSyncService(repository)
+    ticks = []
+    service._sync_with_mt5 = lambda: ticks.append(time.monotonic())
+
+    service.start()
+    service.start()  # ya en marcha: no registra otro job
+    deadline = time.monotonic() + 2
+    while not ticks and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(ticks) == 1
+    assert service.next_run_at > datetime.now()
+
+    service.stop()
+    assert service._job_id is None and service.next_run_at is None
+
+
+# ==================== SINCRONIZACIÓN INCREMENTAL ====================
+
+def test_incremental_sync_matches_full_window_sync(tmp_path, history):
+    results = {}
+    for incremental in (False, True):
+        repository = TradeRepository(db_path=str(tmp_path / f'{incremental}.db'))
+        service = TradeSyncService(repository)
+        history.ranges.clear()
+        for cut in (NOW - 2 * 86400, NOW - 86400, NOW - 600, NOW):
+            history.now = cut
+            if not incremental:
+                service._last_deal_time = None
+            service._sync_with_mt5()
+        results[incremental] = _rows(repository)
+        ranges = list(history.ranges)
+        repository.close()
+
+    assert results[True] == results[False]
+    assert len(results[True]) == 299
+    # Tras la primera, cada consulta empieza en el último deal visto menos el solape
+    assert ranges[-1] > ranges[0]
+    assert ranges[-1] <= datetime.fromtimestamp(max(d.time for d in history.deals if d.time <= NOW - 600)) \
+        - TradeSyncService.SYNC_OVERLAP
+
+
+def test_sync_closes_existing_trades_with_reason_from_comment(repository, history):
+    history.deals = [_entry(1, NOW - 7200, 500), _exit(1, NOW - 60, 12.5, comment='[sl 1.0950]')]
+    repository.save_trade(Trade(ticket=500, bot_id='mine', symbol='EURUSD', action='buy', entry_price=1.1))
+
+    service = TradeSyncService(repository)
+    history.now = NOW - 3600
+    service._sync_with_mt5()
+    assert repository.get_trade_by_ticket(500).status == TradeStatus.OPENED
+
+    history.now = NOW
+    service._sync_with_mt5()
+    trade = repository.get_trade_by_ticket(500)
+    assert (trade.bot_id, trade.status, trade.close_reason, trade.profit) == ('mine', TradeStatus.CLOSED, 'sl', 12.5)
+
+
+def test_position_opened_before_window_is_completed(repository, history):
+    # Abierta hace 10 días (fuera de history_days), cerrada hace una hora
+    history.deals = [_entry(777, NOW - 10 * 86400, 99_999), _exit(777, NOW - 3600, 9.0)]
+    repository.save_trade(Trade(ticket=99_999, bot_id='mine', symbol='EURUSD', action='buy', entry_price=1.0))
+
+    TradeSyncService(repository)._sync_with_mt5()
+
+    assert history.positions == [777]
+    rows = _rows(repository)
+    assert len(rows) == 1
+    assert rows[0][0] == 99_999 and rows[0][5] == TradeStatus.CLOSED.value
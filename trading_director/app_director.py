@@ -17,24 +17,27 @@ from utils.utils import Utils
 from utils.global_state import global_state
 
 
+# Código de timeframe MT5 -> nombre legible (construido una sola vez al importar)
+TIMEFRAME_NAMES = {
+    mt5.TIMEFRAME_M1: 'M1',
+    mt5.TIMEFRAME_M5: 'M5',
+    mt5.TIMEFRAME_M15: 'M15',
+    mt5.TIMEFRAME_M30: 'M30',
+    mt5.TIMEFRAME_H1: 'H1',
+    mt5.TIMEFRAME_H4: 'H4',
+    mt5.TIMEFRAME_D1: 'D1',
+    mt5.TIMEFRAME_W1: 'W1',
+    mt5.TIMEFRAME_MN1: 'MN1',
+}
+
+
 class BotConfig:
     """Configuración para un bot individual."""
     
     @staticmethod
     def _get_timeframe_name(timeframe: int) -> str:
         """Convierte el código de timeframe MT5 a nombre legible."""
-        timeframe_map = {
-            mt5.TIMEFRAME_M1: 'M1',
-            mt5.TIMEFRAME_M5: 'M5',
-            mt5.TIMEFRAME_M15: 'M15',
-            mt5.TIMEFRAME_M30: 'M30',
-            mt5.TIMEFRAME_H1: 'H1',
-            mt5.TIMEFRAME_H4: 'H4',
-            mt5.TIMEFRAME_D1: 'D1',
-            mt5.TIMEFRAME_W1: 'W1',
-            mt5.TIMEFRAME_MN1: 'MN1',
-        }
-        return timeframe_map.get(timeframe, str(timeframe))
+        return TIMEFRAME_NAMES.get(timeframe, str(timeframe))
     
     def __init__(
         self,
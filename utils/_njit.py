@@ -0,0 +1,18 @@
+"""
+Numba decorators with a pure-Python fallback.
+
+Compiled kernels import njit/prange from here, so they run as regular Python
+(just slower) when Numba is not installed.
+"""
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Fallback when Numba is missing: return the function uncompiled."""
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func